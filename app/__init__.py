@@ -1,42 +1,56 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-import os
 from flask_migrate import Migrate
+from .config import Config
+from .database import RoutingSession, configure_engine, configure_routing
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 migrate = Migrate()
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__)
-    app.config["SECRET_KEY"] = "supersecretkey"
-    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///../data/mini_shop.db"
-    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config.from_object(Config)
+    app.config.from_prefixed_env("SHOP")
+    if config:
+        app.config.update(config)
 
     db.init_app(app)
-    migrate.init_app(app, db)   
+    configure_engine(app, db)
+    configure_routing(app, db)
+    migrate.init_app(app, db, render_as_batch=True)
+
+    from .metrics import metrics
+    metrics.init_app(app, db)
+
+    from .compression import compression
+    compression.init_app(app)
+
+    from .assets import assets
+    assets.init_app(app)
+
+    from .catalog import catalog_cache
+    catalog_cache.init_app(app)
+
+    from .fragments import fragment_cache
+    fragment_cache.init_app(app)
 
     from .routes import bp
     app.register_blueprint(bp)
 
-    with app.app_context():
-        from .models import User
-        db.create_all()
-        if not User.query.filter_by(username="admin").first():
-            admin = User(
-                username="admin",
-                role="admin",
-                first_name="Admin",
-                last_name="User",
-                street="Testowa",
-                house_number="1",
-                postal_code="00-000",
-                city="Nowhere",
-                email="admin@example.com"
-            )
-            admin.set_password("admin")
-            db.session.add(admin)
-            db.session.commit()
+    from .api import bp as api_bp
+    app.register_blueprint(api_bp)
 
+    from . import images
+    app.add_template_filter(images.srcset, "srcset")
+    app.add_template_filter(images.thumbnail_url, "thumbnail_url")
 
-    return app
+    from .pricing import format_grosze
+    app.add_template_filter(format_grosze, "grosze")
 
+    from .commands import register_commands
+    register_commands(app)
+
+    # No database access here: the schema comes from `flask db upgrade`
+    # and the first admin from `flask users create-admin`, so workers,
+    # CLI commands and tests start without touching the database.
+    return app
@@ -0,0 +1,140 @@
+from collections import defaultdict
+from datetime import date, timedelta
+
+from sqlalchemy import Integer, cast, delete, func, literal, select
+from sqlalchemy.dialects.sqlite import insert
+
+from . import db
+from .models import Order, OrderItem, Product, SalesRollup
+
+
+DASHBOARD_PERIODS = (7, 30, 90, 365)
+TOP_PRODUCTS = 10
+
+
+def _upsert(day):
+    # `day` is an SQL expression; the counters come in as parameters and
+    # are added to whatever the row already holds.
+    stmt = insert(SalesRollup).values(day=day)
+    return stmt.on_conflict_do_update(
+        index_elements=[SalesRollup.dimension, SalesRollup.day, SalesRollup.key],
+        set_={
+            "orders": SalesRollup.orders + stmt.excluded.orders,
+            "quantity": SalesRollup.quantity + stmt.excluded.quantity,
+            "revenue": SalesRollup.revenue + stmt.excluded.revenue,
+        },
+    )
+
+
+def record_order(order, quote):
+    """Add one freshly flushed order to the rollups (caller commits)."""
+    quantity = sum(line.quantity for line in quote.lines)
+    rows = [
+        {"dimension": dimension, "key": key, "orders": 1, "quantity": quantity, "revenue": quote.total}
+        for dimension, key in (
+            ("total", ""),
+            ("payment", order.payment_method or ""),
+            ("delivery", order.delivery_method or ""),
+        )
+    ]
+
+    categories = defaultdict(lambda: [0, 0])
+    for line in quote.lines:
+        rows.append({
+            "dimension": "product", "key": str(line.product.id), "orders": 1,
+            "quantity": line.quantity, "revenue": line.subtotal,
+        })
+        totals = categories[line.product.category or ""]
+        totals[0] += line.quantity
+        totals[1] += line.subtotal
+    rows.extend(
+        {"dimension": "category", "key": category, "orders": 1, "quantity": qty, "revenue": revenue}
+        for category, (qty, revenue) in categories.items()
+    )
+
+    # The day comes from the order row itself (created_at is set by the
+    # database), so incremental updates and rebuild() agree on it.
+    day = select(func.date(Order.created_at)).where(Order.id == order.id).scalar_subquery()
+    db.session.execute(_upsert(day), rows)
+
+
+def rebuild():
+    """Recompute every rollup from the order tables; returns rows written."""
+    db.session.execute(delete(SalesRollup))
+
+    day = func.date(Order.created_at)
+    order_revenue = cast(func.round(Order.total * 100), Integer)
+    line_revenue = cast(func.round(OrderItem.price * OrderItem.quantity * 100), Integer)
+    item_quantity = (
+        select(OrderItem.order_id, func.sum(OrderItem.quantity).label("quantity"))
+        .group_by(OrderItem.order_id)
+        .subquery()
+    )
+
+    def per_order(dimension, key):
+        return (
+            select(literal(dimension), day, key, func.count(),
+                   func.coalesce(func.sum(item_quantity.c.quantity), 0), func.sum(order_revenue))
+            .outerjoin(item_quantity, item_quantity.c.order_id == Order.id)
+            .where(Order.created_at.isnot(None))
+            .group_by(day, key)
+        )
+
+    def per_line(dimension, key):
+        return (
+            select(literal(dimension), day, key, func.count(func.distinct(Order.id)),
+                   func.sum(OrderItem.quantity), func.sum(line_revenue))
+            .join(OrderItem, OrderItem.order_id == Order.id)
+            .outerjoin(Product, Product.id == OrderItem.product_id)
+            .where(Order.created_at.isnot(None))
+            .group_by(day, key)
+        )
+
+    queries = (
+        per_order("total", literal("")),
+        per_order("payment", func.coalesce(Order.payment_method, "")),
+        per_order("delivery", func.coalesce(Order.delivery_method, "")),
+        per_line("product", cast(OrderItem.product_id, db.String)),
+        per_line("category", func.coalesce(Product.category, "")),
+    )
+    columns = ["dimension", "day", "key", "orders", "quantity", "revenue"]
+    for query in queries:
+        db.session.execute(insert(SalesRollup).from_select(columns, query))
+    db.session.commit()
+    return db.session.scalar(select(func.count()).select_from(SalesRollup))
+
+
+def _totals_by_key(dimension, since, limit=None):
+    query = (
+        select(SalesRollup.key,
+               func.sum(SalesRollup.orders).label("orders"),
+               func.sum(SalesRollup.quantity).label("quantity"),
+               func.sum(SalesRollup.revenue).label("revenue"))
+        .where(SalesRollup.dimension == dimension, SalesRollup.day >= since)
+        .group_by(SalesRollup.key)
+        .order_by(func.sum(SalesRollup.revenue).desc())
+    )
+    if limit:
+        query = query.limit(limit)
+    return db.session.execute(query).all()
+
+
+def dashboard(days, today=None):
+    # Every query reads a date range of one dimension, so its cost depends
+    # on the period and catalog breadth, never on the order history.
+    since = (today or date.today()) - timedelta(days=days - 1)
+    daily = db.session.execute(
+        select(SalesRollup.day, SalesRollup.orders, SalesRollup.quantity, SalesRollup.revenue)
+        .where(SalesRollup.dimension == "total", SalesRollup.day >= since)
+        .order_by(SalesRollup.day)
+    ).all()
+    return {
+        "since": since,
+        "daily": daily,
+        "orders": sum(row.orders for row in daily),
+        "revenue": sum(row.revenue for row in daily),
+        "top_products": _totals_by_key("product", since, TOP_PRODUCTS),
+        "categories": _totals_by_key("category", since),
+        "payment": _totals_by_key("payment", since),
+        "delivery": _totals_by_key("delivery", since),
+    }
@@ -0,0 +1,234 @@
+import json
+from operator import attrgetter
+
+from flask import Blueprint, abort, current_app, request
+from werkzeug.exceptions import HTTPException
+
+from . import carts, catalog, http_cache, images, pricing
+from .cache import MISSING, LRUCache
+from .catalog import catalog_cache
+
+# JSON API for mobile and partner clients: the same cached snapshots the
+# HTML pages use, without the templates. Money is integer grosze, as
+# everywhere inside the shop. `fields=id,name,price` selects what each
+# product carries; catalog responses do not depend on the session, so they
+# are public and share ETags across clients.
+
+bp = Blueprint("api", __name__, url_prefix="/api/v1")
+
+
+FIELDS = {
+    "id": attrgetter("id"),
+    "name": attrgetter("name"),
+    "price": lambda product: pricing.to_grosze(product.price),
+    "category": attrgetter("category"),
+    "description": attrgetter("description"),
+    "properties": attrgetter("properties"),
+    "preparation": attrgetter("preparation"),
+    "image_url": attrgetter("image_url"),
+    "thumbnail_url": images.thumbnail_url,
+    "srcset": images.srcset,
+    "updated_at": lambda product: product.updated_at.isoformat() if product.updated_at else None,
+    "version": attrgetter("version"),
+}
+LIST_FIELDS = ("id", "name", "price", "category", "thumbnail_url", "version")
+
+# Encoded product objects keyed by (product id, field names), tagged with
+# the version they came from like the HTML fragments; a list response is
+# joined from these strings instead of being re-serialized.
+_encoded = LRUCache(maxsize=8192)
+
+
+def _dumps(value):
+    # Flask's JSON provider would sort the keys on every call; compact
+    # separators keep payloads small.
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def _response(body, status=200):
+    return current_app.response_class(body, status=status, mimetype="application/json")
+
+
+def _json(payload, status=200):
+    return _response(_dumps(payload), status)
+
+
+@bp.errorhandler(HTTPException)
+def error(exc):
+    return _json({"error": exc.name, "message": exc.description}, exc.code)
+
+
+@bp.app_errorhandler(404)
+@bp.app_errorhandler(405)
+def routing_error(exc):
+    # Unknown URLs and methods fail in routing, before any blueprint is
+    # picked, so they land here instead of in error() above.
+    if request.path.startswith(bp.url_prefix + "/"):
+        return error(exc)
+    return exc
+
+
+def _fields(default):
+    requested = request.args.get("fields")
+    if not requested:
+        names = default
+    else:
+        names = tuple(dict.fromkeys(name.strip() for name in requested.split(",") if name.strip()))
+        unknown = [name for name in names if name not in FIELDS]
+        if unknown:
+            abort(400, f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(FIELDS)}.")
+    return names
+
+
+def _encode(product, fields):
+    key = (product.id, fields)
+    entry = _encoded.get(key)
+    if entry is not MISSING and entry[0] == product.version:
+        return entry[1]
+    body = _dumps({name: FIELDS[name](product) for name in fields})
+    _encoded.set(key, (product.version, body))
+    return body
+
+
+def _encode_list(products, fields):
+    return "[" + ",".join(_encode(product, fields) for product in products) + "]"
+
+
+def _ids(raw):
+    try:
+        ids = list(dict.fromkeys(int(part) for part in raw.split(",") if part.strip()))
+    except ValueError:
+        abort(400, "ids must be comma-separated integers.")
+    limit = current_app.config["CATALOG_MAX_PAGE_SIZE"]
+    if not ids or len(ids) > limit:
+        abort(400, f"Pass between 1 and {limit} ids.")
+    return ids
+
+
+@bp.route("/products")
+def products():
+    """A page of the catalog (same filters and cursors as the HTML
+    listing), or with ?ids=1,2,3 exactly those products."""
+    if "ids" in request.args:
+        return _batch(_ids(request.args["ids"]))
+
+    fields = _fields(LIST_FIELDS)
+    page = catalog.cached_products(
+        category=request.args.get("category", "all"),
+        sort=request.args.get("sort", catalog.DEFAULT_SORT),
+        after=request.args.get("after"),
+        before=request.args.get("before"),
+        per_page=request.args.get("per_page"),
+    )
+    return http_cache.conditional(
+        lambda: _response(
+            f'{{"items":{_encode_list(page.items, fields)},'
+            f'"next":{_dumps(page.next_cursor)},"prev":{_dumps(page.prev_cursor)}}}'
+        ),
+        validators=[(p.id, p.version) for p in page.items],
+        last_modified=max((p.updated_at for p in page.items), default=None),
+        check_modified_since=False,
+        personal=False,
+    )
+
+
+def _batch(ids):
+    fields = _fields(LIST_FIELDS)
+    found = catalog_cache.get_products(ids)
+    items = [found[product_id] for product_id in ids if product_id in found]
+    missing = [product_id for product_id in ids if product_id not in found]
+    return http_cache.conditional(
+        lambda: _response(f'{{"items":{_encode_list(items, fields)},"missing":{_dumps(missing)}}}'),
+        validators=([(p.id, p.version) for p in items], missing),
+        last_modified=max((p.updated_at for p in items), default=None),
+        check_modified_since=False,
+        personal=False,
+    )
+
+
+@bp.route("/products/<int:product_id>")
+def product(product_id):
+    fields = _fields(tuple(FIELDS))
+    snapshot = catalog_cache.get_product(product_id)
+    if snapshot is None:
+        abort(404, "No such product.")
+    return http_cache.conditional(
+        lambda: _response(_encode(snapshot, fields)),
+        validators=(snapshot.id, snapshot.version),
+        last_modified=snapshot.updated_at,
+        personal=False,
+    )
+
+
+def _cart_payload(quote):
+    return {
+        "items": [
+            {
+                "product_id": line.product.id,
+                "name": line.product.name,
+                "quantity": line.quantity,
+                "unit_price": line.unit_price,
+                "subtotal": line.subtotal,
+            }
+            for line in quote.lines
+        ],
+        "items_total": quote.items_total,
+    }
+
+
+@bp.route("/cart")
+def cart():
+    quote = pricing.quote(carts.load())
+    return http_cache.conditional(
+        lambda: _json(_cart_payload(quote)),
+        validators=[(line.product.id, line.product.version) for line in quote.lines],
+    )
+
+
+def _cart_response(status=200, **extra):
+    response = _json(dict(_cart_payload(pricing.quote(carts.load())), **extra), status)
+    response.cache_control.no_store = True
+    return response
+
+
+@bp.route("/cart/items/<int:product_id>", methods=["PUT"])
+def set_cart_item(product_id):
+    """Set a product's quantity in the cart: {"quantity": 2}; 0 removes it.
+
+    409 when the stock cannot cover the increase; the cart is then
+    returned unchanged.
+    """
+    # Only JSON bodies: a cross-site form cannot send one without a CORS
+    # preflight, which is what keeps the cookie session safe here.
+    payload = request.get_json(silent=True) if request.is_json else None
+    quantity = payload.get("quantity") if isinstance(payload, dict) else None
+    if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 0:
+        abort(400, 'Send a JSON body like {"quantity": 2}.')
+    if catalog_cache.get_product(product_id) is None:
+        abort(404, "No such product.")
+
+    current = carts.load().get(product_id, 0)
+    if quantity == 0:
+        carts.remove(product_id)
+        reserved = True
+    elif current == 0:
+        reserved = carts.add(product_id, quantity)
+    elif quantity != current:
+        reserved = carts.change(product_id, quantity - current)
+    else:
+        reserved = True
+    if not reserved:
+        return _cart_response(409, error="Out of stock")
+    return _cart_response()
+
+
+@bp.route("/cart/items/<int:product_id>", methods=["DELETE"])
+def delete_cart_item(product_id):
+    carts.remove(product_id)
+    return _cart_response()
+
+
+@bp.route("/cart", methods=["DELETE"])
+def clear_cart():
+    carts.clear()
+    return _cart_response()
@@ -0,0 +1,140 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+
+from flask import current_app, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+
+# `flask assets build` copies every file under static/ (except product
+# images) to static/dist/ under a content-hashed name, stores gzip and
+# Brotli variants of the text ones next to it and writes a manifest.
+# Templates ask for `static_url("css/shop.css")`, which returns the hashed
+# URL once a build exists, so those files can be cached forever: any
+# change produces a new URL. Without a build (development) it falls back
+# to the plain static URL with the default revalidating cache.
+
+DIST = "dist"
+MANIFEST = "manifest.json"
+COMPRESSIBLE = {".css", ".js", ".mjs", ".svg", ".json", ".map", ".txt", ".xml"}
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+ONE_YEAR = 365 * 24 * 3600
+# Uploaded product images are already stored under their content hash
+# (images.save_image), so they are immutable too.
+CONTENT_KEYED = re.compile(r"images/[0-9a-f]{16}[-.]")
+
+
+def _compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def build(static_folder):
+    """Write static/dist/ and its manifest; returns the manifest."""
+    dist = os.path.join(static_folder, DIST)
+    shutil.rmtree(dist, ignore_errors=True)
+    files, compressed = {}, {}
+    for root, dirs, names in os.walk(static_folder):
+        if root == static_folder:
+            dirs[:] = [d for d in dirs if d not in (DIST, "images")]
+        for name in sorted(names):
+            source = os.path.join(root, name)
+            logical = os.path.relpath(source, static_folder).replace(os.sep, "/")
+            with open(source, "rb") as f:
+                data = f.read()
+            stem, ext = os.path.splitext(logical)
+            hashed = f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+            target = os.path.join(dist, hashed)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, "wb") as f:
+                f.write(data)
+            files[logical] = hashed
+
+            if ext.lower() not in COMPRESSIBLE:
+                continue
+            for encoding, suffix in ENCODINGS:
+                if encoding == "br" and brotli is None:
+                    continue
+                packed = _compress(data, encoding)
+                if len(packed) < len(data):
+                    with open(target + suffix, "wb") as f:
+                        f.write(packed)
+                    compressed.setdefault(hashed, []).append(encoding)
+
+    manifest = {"files": files, "compressed": compressed}
+    with open(os.path.join(dist, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    return manifest
+
+
+class Assets:
+    def __init__(self, app=None):
+        self.files = {}
+        self.compressed = {}
+        self.digest = ""
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("STATIC_IMMUTABLE_MAX_AGE", ONE_YEAR)
+        self.load(app.static_folder)
+        app.add_template_global(self.url, "static_url")
+        app.view_functions["static"] = self.send_static
+        app.extensions["assets"] = self
+
+    def load(self, static_folder):
+        path = os.path.join(static_folder, DIST, MANIFEST)
+        try:
+            with open(path, "rb") as f:
+                raw = f.read()
+        except FileNotFoundError:
+            self.files, self.compressed, self.digest = {}, {}, ""
+            return
+        manifest = json.loads(raw)
+        self.files = manifest["files"]
+        self.compressed = manifest["compressed"]
+        self.digest = hashlib.sha1(raw).hexdigest()[:12]
+
+    def url(self, filename):
+        """url_for("static", filename=...) for a fingerprinted copy when one
+        exists. With template auto-reload (debug) edits to static files must
+        show up immediately, so the plain file is used."""
+        hashed = self.files.get(filename)
+        if hashed is None or current_app.jinja_env.auto_reload:
+            return url_for("static", filename=filename)
+        return url_for("static", filename=f"{DIST}/{hashed}")
+
+    def send_static(self, filename):
+        if not (filename.startswith(DIST + "/") or CONTENT_KEYED.match(filename)):
+            return current_app.send_static_file(filename)
+
+        folder = current_app.static_folder
+        max_age = current_app.config["STATIC_IMMUTABLE_MAX_AGE"]
+        available = self.compressed.get(filename[len(DIST) + 1:], ())
+        for encoding, suffix in ENCODINGS:
+            if encoding in available and request.accept_encodings[encoding]:
+                response = send_from_directory(
+                    folder, filename + suffix, max_age=max_age,
+                    mimetype=mimetypes.guess_type(filename)[0],
+                )
+                response.headers["Content-Encoding"] = encoding
+                break
+        else:
+            response = send_from_directory(folder, filename, max_age=max_age)
+        if available:
+            response.vary.add("Accept-Encoding")
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+
+assets = Assets()
@@ -0,0 +1,159 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+MISSING = object()
+
+
+class LRUCache:
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            entry = self._data.get(key, MISSING)
+            if entry is not MISSING:
+                value, expires = entry
+                if expires is None or expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class SqliteBackend:
+    # Stand-in for a shared cache server (Redis, memcached): a key/value
+    # table in a local SQLite file that every worker process can see.
+    # Unlike a cache server nothing evicts on its own, so every
+    # PRUNE_EVERY writes a process deletes expired rows and, past
+    # `maxsize`, the oldest ones.
+
+    PRUNE_EVERY = 100
+
+    def __init__(self, path, ttl=None, maxsize=None):
+        self.path = path
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._local = threading.local()
+        self._writes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entry ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_counter ("
+                "key TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, default=MISSING):
+        row = self._connect().execute(
+            "SELECT value, expires FROM cache_entry WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return default
+        return pickle.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.time() + ttl if ttl else None
+        self._connect().execute(
+            "INSERT OR REPLACE INTO cache_entry (key, value, expires) VALUES (?, ?, ?)",
+            (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires),
+        )
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self.prune()
+
+    def prune(self):
+        conn = self._connect()
+        conn.execute("DELETE FROM cache_entry WHERE expires <= ?", (time.time(),))
+        if self.maxsize:
+            # INSERT OR REPLACE gives every write a new rowid, so the lowest
+            # rowids are the entries written longest ago.
+            conn.execute(
+                "DELETE FROM cache_entry WHERE rowid <= "
+                "(SELECT rowid FROM cache_entry ORDER BY rowid DESC LIMIT 1 OFFSET ?)",
+                (self.maxsize,),
+            )
+
+    def delete(self, key):
+        self._connect().execute("DELETE FROM cache_entry WHERE key = ?", (key,))
+
+    def delete_prefix(self, prefix):
+        self._connect().execute(
+            "DELETE FROM cache_entry WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+        )
+
+    def get_counter(self, key):
+        row = self._connect().execute(
+            "SELECT value FROM cache_counter WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def incr(self, key):
+        return self._connect().execute(
+            "INSERT INTO cache_counter (key, value) VALUES (?, 1) "
+            "ON CONFLICT(key) DO UPDATE SET value = value + 1 RETURNING value",
+            (key,),
+        ).fetchone()[0]
+
+    def clear(self):
+        conn = self._connect()
+        conn.execute("DELETE FROM cache_entry")
+        conn.execute("DELETE FROM cache_counter")
+
+    def __len__(self):
+        return self._connect().execute("SELECT count(*) FROM cache_entry").fetchone()[0]
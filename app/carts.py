@@ -0,0 +1,192 @@
+import secrets
+from datetime import datetime, timedelta
+
+from flask import g, session
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.sqlite import insert
+
+from . import db, inventory
+from .models import Cart, CartItem
+
+
+# The session cookie only carries this token; cart contents live in the
+# cart/cart_item tables and every change is a single atomic statement.
+TOKEN_KEY = "cart_token"
+
+
+def _touch(cart_id):
+    db.session.execute(update(Cart).where(Cart.id == cart_id).values(updated_at=db.func.now()))
+
+
+def _owner():
+    # A logged-in user has one cart whichever device it is used from: a
+    # session without a cart token finds it by user_id, and cart_id()
+    # then keeps its token in the session.
+    token = session.get(TOKEN_KEY)
+    if token:
+        return Cart.token == token
+    user_id = session.get("user_id")
+    return Cart.user_id == user_id if user_id is not None else None
+
+
+def _create():
+    token = secrets.token_urlsafe(16)
+    user_id = session.get("user_id")
+    stmt = insert(Cart).values(token=token, user_id=user_id)
+    if user_id is not None:
+        # Another device of the same user may create it first; this insert
+        # then does nothing and the select picks up that cart.
+        stmt = stmt.on_conflict_do_nothing(index_elements=[Cart.user_id])
+    db.session.execute(stmt)
+    owner = Cart.token == token if user_id is None else Cart.user_id == user_id
+    return db.session.execute(select(Cart.id, Cart.token).where(owner)).one()
+
+
+def cart_id(create=False):
+    if "cart_id" in g and (g.cart_id is not None or not create):
+        return g.cart_id
+
+    found = None
+    owner = _owner()
+    if owner is not None:
+        found = db.session.execute(select(Cart.id, Cart.token).where(owner)).first()
+    if found is None and create:
+        found = _create()
+    if found is not None and session.get(TOKEN_KEY) != found.token:
+        session[TOKEN_KEY] = found.token
+    g.cart_id = found.id if found is not None else None
+    return g.cart_id
+
+
+def load():
+    if "cart" in g:
+        return g.cart
+    owner = _owner()
+    items = {}
+    if owner is not None:
+        rows = db.session.execute(
+            select(CartItem.product_id, CartItem.quantity)
+            .join(Cart, Cart.id == CartItem.cart_id)
+            .where(owner)
+        )
+        items = {product_id: quantity for product_id, quantity in rows}
+    g.cart = items
+    return items
+
+
+def _changed():
+    g.pop("cart", None)
+
+
+def add(product_id, quantity=1):
+    # False (and nothing added) when the product is sold out.
+    current = cart_id(create=True)
+    if not inventory.reserve(current, product_id, quantity):
+        db.session.commit()
+        return False
+    stmt = insert(CartItem).values(cart_id=current, product_id=product_id, quantity=quantity)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=[CartItem.cart_id, CartItem.product_id],
+        set_={"quantity": CartItem.quantity + stmt.excluded.quantity},
+    ))
+    _touch(current)
+    db.session.commit()
+    _changed()
+    return True
+
+
+def change(product_id, delta):
+    # False when the product is not in the cart or an increase hits the
+    # end of the stock. Stock is only reserved for a row that exists.
+    current = cart_id()
+    if current is None:
+        return False
+    item = (CartItem.cart_id == current) & (CartItem.product_id == product_id)
+    result = db.session.execute(update(CartItem).where(item).values(quantity=CartItem.quantity + delta))
+    if result.rowcount == 0:
+        return False
+    if delta > 0 and not inventory.reserve(current, product_id, delta):
+        # Undo the increase but keep any expired holds reserve() returned.
+        db.session.execute(update(CartItem).where(item).values(quantity=CartItem.quantity - delta))
+        db.session.commit()
+        return False
+    if delta < 0:
+        inventory.release(current, product_id, -delta)
+    db.session.execute(delete(CartItem).where(item & (CartItem.quantity <= 0)))
+    _touch(current)
+    db.session.commit()
+    _changed()
+    return True
+
+
+def remove(product_id):
+    current = cart_id()
+    if current is None:
+        return False
+    inventory.release(current, product_id)
+    result = db.session.execute(
+        delete(CartItem).where(CartItem.cart_id == current, CartItem.product_id == product_id)
+    )
+    db.session.commit()
+    _changed()
+    return result.rowcount > 0
+
+
+def clear(commit=True):
+    current = cart_id()
+    if current is not None:
+        # At checkout the order has already consumed the reservations.
+        inventory.release(current)
+        db.session.execute(delete(CartItem).where(CartItem.cart_id == current))
+        if commit:
+            db.session.commit()
+    _changed()
+
+
+def merge_on_login(user_id):
+    # The user's saved cart (from another device or an earlier visit)
+    # absorbs whatever they collected anonymously before logging in.
+    anonymous = cart_id()
+    own = db.session.execute(select(Cart.id, Cart.token).where(Cart.user_id == user_id)).first()
+
+    if own is None:
+        if anonymous is not None:
+            db.session.execute(update(Cart).where(Cart.id == anonymous).values(user_id=user_id))
+            db.session.commit()
+        return
+
+    if anonymous is not None and anonymous != own.id:
+        rows = db.session.execute(
+            select(CartItem.product_id, CartItem.quantity).where(CartItem.cart_id == anonymous)
+        ).all()
+        if rows:
+            stmt = insert(CartItem)
+            db.session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[CartItem.cart_id, CartItem.product_id],
+                    set_={"quantity": CartItem.quantity + stmt.excluded.quantity},
+                ),
+                [{"cart_id": own.id, "product_id": p, "quantity": q} for p, q in rows],
+            )
+        inventory.move(anonymous, own.id)
+        db.session.execute(delete(CartItem).where(CartItem.cart_id == anonymous))
+        db.session.execute(delete(Cart).where(Cart.id == anonymous))
+        _touch(own.id)
+        db.session.commit()
+
+    session[TOKEN_KEY] = own.token
+    g.pop("cart_id", None)
+    _changed()
+
+
+def purge_anonymous(older_than_days):
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    # Reservations run out within minutes, long before a cart is this old.
+    inventory.release_expired()
+    stale = select(Cart.id).where(Cart.user_id.is_(None), Cart.updated_at < cutoff)
+    db.session.execute(delete(CartItem).where(CartItem.cart_id.in_(stale)))
+    result = db.session.execute(
+        delete(Cart).where(Cart.user_id.is_(None), Cart.updated_at < cutoff)
+    )
+    db.session.commit()
+    return result.rowcount
@@ -0,0 +1,242 @@
+import os
+from collections import namedtuple
+
+from flask import current_app, g
+
+from .cache import MISSING, LRUCache, SqliteBackend
+from .database import primary
+from .models import Product
+from .pagination import decode_cursor, encode_cursor, keyset_page
+
+
+SORTS = {
+    "newest": ("Najnowsze", [Product.id], True),
+    "price_asc": ("Cena rosnąco", [Product.price, Product.id], False),
+    "price_desc": ("Cena malejąco", [Product.price, Product.id], True),
+}
+DEFAULT_SORT = "newest"
+
+PRODUCT_FIELDS = (
+    "id", "name", "price", "image_url", "image_key", "image_widths",
+    "category", "description", "properties", "preparation", "updated_at", "version",
+)
+
+
+class ProductSnapshot(namedtuple("ProductSnapshot", PRODUCT_FIELDS)):
+    __slots__ = ()
+
+    @classmethod
+    def from_model(cls, product):
+        return cls(*(getattr(product, field) for field in PRODUCT_FIELDS))
+
+
+class CatalogCache:
+    # Two tiers: a per-process LRU in front of an optional shared backend.
+    # Products are cached per id and dropped when edited or deleted;
+    # listing pages are keyed by a catalog generation that every admin
+    # write bumps. With a shared backend the generation lives there, so a
+    # write in one worker also retires the local copies in the others.
+    # Without one, invalidation only reaches the process that made the
+    # edit and the other workers serve the old data for up to
+    # CATALOG_CACHE_TTL; hence the shared backend is switched on by
+    # default whenever WEB_CONCURRENCY asks for more than one process.
+    # Misses are loaded from the primary database: right after an
+    # invalidation a replica may still serve the old row, which would then
+    # stay cached until the next edit.
+
+    GENERATION_KEY = "catalog:generation"
+
+    def __init__(self, app=None):
+        self.local = None
+        self.shared = None
+        self._generation = 0
+        self.db_loads = 0
+        self.shared_hits = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("CATALOG_CACHE_SIZE", 4096)
+        app.config.setdefault("CATALOG_CACHE_TTL", 300)
+        app.config.setdefault("CATALOG_CACHE_SHARED_PATH", None)
+        app.config.setdefault("CATALOG_CACHE_SHARED_SIZE", 16384)
+
+        self.local = LRUCache(
+            maxsize=app.config["CATALOG_CACHE_SIZE"],
+            ttl=app.config["CATALOG_CACHE_TTL"],
+        )
+        path = app.config["CATALOG_CACHE_SHARED_PATH"]
+        processes = int(os.environ.get("WEB_CONCURRENCY", 1))
+        if path is None and processes > 1:
+            path = os.path.join(app.instance_path, "catalog_cache.db")
+        if path:
+            self.shared = SqliteBackend(
+                path,
+                ttl=app.config["CATALOG_CACHE_TTL"],
+                maxsize=app.config["CATALOG_CACHE_SHARED_SIZE"],
+            )
+        else:
+            self.shared = None
+            if processes > 1:
+                app.logger.warning(
+                    "Catalog cache is per process (CATALOG_CACHE_SHARED_PATH is empty) with %s "
+                    "workers: edits reach the other workers only after CATALOG_CACHE_TTL (%ss).",
+                    processes, app.config["CATALOG_CACHE_TTL"],
+                )
+        app.extensions["catalog_cache"] = self
+
+    def generation(self):
+        if self.shared is None:
+            return self._generation
+        if "catalog_generation" not in g:
+            g.catalog_generation = self.shared.get_counter(self.GENERATION_KEY)
+        return g.catalog_generation
+
+    def _get(self, key):
+        generation = self.generation()
+        entry = self.local.get(key)
+        if entry is not MISSING:
+            entry_generation, value = entry
+            if self.shared is None or entry_generation == generation:
+                return value
+        if self.shared is not None:
+            value = self.shared.get(key)
+            if value is not MISSING:
+                self.shared_hits += 1
+                self.local.set(key, (generation, value))
+                return value
+        return MISSING
+
+    def _set(self, key, value):
+        self.local.set(key, (self.generation(), value))
+        if self.shared is not None:
+            self.shared.set(key, value)
+
+    def _delete(self, key):
+        self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete(key)
+
+    def get_product(self, product_id):
+        key = f"product:{product_id}"
+        snapshot = self._get(key)
+        if snapshot is MISSING:
+            self.db_loads += 1
+            with primary():
+                product = Product.query.get(product_id)
+            if product is None:
+                return None
+            snapshot = ProductSnapshot.from_model(product)
+            self._set(key, snapshot)
+        return snapshot
+
+    def get_products(self, product_ids):
+        found = {}
+        missing = []
+        for product_id in product_ids:
+            snapshot = self._get(f"product:{product_id}")
+            if snapshot is MISSING:
+                missing.append(product_id)
+            else:
+                found[product_id] = snapshot
+        if missing:
+            self.db_loads += 1
+            with primary():
+                loaded = Product.query.filter(Product.id.in_(missing)).all()
+            for product in loaded:
+                snapshot = ProductSnapshot.from_model(product)
+                self._set(f"product:{product.id}", snapshot)
+                found[product.id] = snapshot
+        return found
+
+    def get_page(self, category, sort, after, before, per_page):
+        # Expects the arguments normalized by cached_products(), so that
+        # URLs showing the same page share one entry.
+        key = f"page:{self.generation()}:{category}:{sort}:{after}:{before}:{per_page}"
+        page = self._get(key)
+        if page is MISSING:
+            self.db_loads += 1
+            with primary():
+                page = list_products(category, sort, after, before, per_page)
+            page.items = [ProductSnapshot.from_model(p) for p in page.items]
+            # An empty page (unknown category, cursor past the end) is
+            # cheap to compute and could be requested under any name.
+            if page.items:
+                self._set(key, page)
+        return page
+
+    def invalidate_product(self, product_id):
+        self._delete(f"product:{product_id}")
+        self.invalidate_listings()
+
+    def invalidate_products(self, product_ids):
+        for product_id in product_ids:
+            self._delete(f"product:{product_id}")
+        self.invalidate_listings()
+
+    def invalidate_listings(self):
+        if self.shared is not None:
+            g.catalog_generation = self.shared.incr(self.GENERATION_KEY)
+            # No key from an older generation will be asked for again.
+            self.shared.delete_prefix("page:")
+        else:
+            self._generation += 1
+
+    def stats(self):
+        local = self.local.stats()
+        return {
+            "local": local,
+            "shared": self.shared is not None,
+            "shared_hits": self.shared_hits,
+            "db_loads": self.db_loads,
+            "generation": self.generation(),
+        }
+
+
+catalog_cache = CatalogCache()
+
+
+def page_size(requested=None):
+    default = current_app.config["CATALOG_PAGE_SIZE"]
+    limit = current_app.config["CATALOG_MAX_PAGE_SIZE"]
+    try:
+        size = int(requested) if requested else default
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, limit))
+
+
+def list_products(category="all", sort=DEFAULT_SORT, after=None, before=None, per_page=None):
+    if sort not in SORTS:
+        sort = DEFAULT_SORT
+    _, columns, descending = SORTS[sort]
+
+    query = Product.query
+    if category != "all":
+        query = query.filter(Product.category == category)
+
+    return keyset_page(
+        query,
+        columns,
+        page_size(per_page),
+        descending=descending,
+        after=after,
+        before=before,
+    )
+
+
+def cached_products(category="all", sort=DEFAULT_SORT, after=None, before=None, per_page=None):
+    if sort not in SORTS:
+        sort = DEFAULT_SORT
+    # Re-encode the cursors: an invalid one means the first page, and
+    # `before` is ignored next to `after`, as in keyset_page().
+    _, columns, _ = SORTS[sort]
+    after = decode_cursor(after, columns)
+    before = decode_cursor(before, columns) if after is None else None
+    return catalog_cache.get_page(
+        category,
+        sort,
+        encode_cursor(after) if after is not None else None,
+        encode_cursor(before) if before is not None else None,
+        page_size(per_page),
+    )
@@ -0,0 +1,314 @@
+import time
+
+import click
+from flask.cli import AppGroup
+
+from . import db
+
+
+images_cli = AppGroup("images", help="Zdjęcia produktów.")
+
+
+@images_cli.command("backfill")
+@click.option("--force", is_flag=True, help="Regenerate derivatives for every product.")
+def images_backfill(force):
+    """Generate WebP derivatives and thumbnails for existing product images."""
+    from .catalog import catalog_cache
+    from .fragments import fragment_cache
+    from .images import backfill_product, derivatives_missing
+    from .models import Product
+
+    products = Product.query.filter(Product.image_url.isnot(None)).all()
+    if not force:
+        products = [product for product in products if derivatives_missing(product)]
+
+    processed = []
+    skipped = 0
+    for product in products:
+        if backfill_product(product):
+            processed.append(product.id)
+        else:
+            skipped += 1
+    db.session.commit()
+    for product_id in processed:
+        catalog_cache.invalidate_product(product_id)
+        fragment_cache.invalidate_product(product_id)
+    click.echo(f"Przetworzono: {len(processed)}, pominięto: {skipped}")
+
+
+search_cli = AppGroup("search", help="Wyszukiwarka produktów.")
+
+
+@search_cli.command("rebuild")
+@click.option("--batch-size", default=2000, show_default=True)
+def search_rebuild(batch_size):
+    """Rebuild the full-text search index from the product table."""
+    from .search import rebuild
+
+    started = time.perf_counter()
+    count = rebuild(batch_size=batch_size)
+    click.echo(f"Zaindeksowano {count} produktów w {time.perf_counter() - started:.2f} s")
+
+
+carts_cli = AppGroup("carts", help="Koszyki.")
+
+
+@carts_cli.command("purge")
+@click.option("--days", default=30, show_default=True, help="Inactivity threshold.")
+def carts_purge(days):
+    """Delete anonymous carts that have not been touched for DAYS days."""
+    from .carts import purge_anonymous
+
+    click.echo(f"Usunięto koszyków: {purge_anonymous(days)}")
+
+
+products_cli = AppGroup("products", help="Produkty.")
+
+
+@products_cli.command("import")
+@click.argument("source", type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+@click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]),
+              help="Input format; defaults to the file extension.")
+@click.option("--batch-size", default=1000, show_default=True)
+@click.option("--images", is_flag=True,
+              help="Run image_url (file path or http(s) URL) through the upload pipeline.")
+@click.option("--image-root", type=click.Path(exists=True, file_okay=False),
+              help="Base directory for image paths; defaults to the SOURCE directory.")
+@click.option("--image-workers", default=4, show_default=True)
+def products_import(source, fmt, batch_size, images, image_root, image_workers):
+    """Import or update products from a CSV or JSONL file (- for stdin).
+
+    Rows are validated like the product form and upserted on `sku`.
+    """
+    import os
+
+    from .product_import import import_products
+
+    if fmt is None:
+        extension = os.path.splitext(source)[1].lower().lstrip(".")
+        if extension not in ("csv", "jsonl"):
+            raise click.UsageError("Cannot infer the format, pass --format.")
+        fmt = extension
+    if images and image_root is None:
+        image_root = os.path.dirname(os.path.abspath(source)) if source != "-" else os.getcwd()
+
+    if source == "-":
+        stream = click.get_text_stream("stdin", encoding="utf-8-sig")
+    else:
+        stream = open(source, encoding="utf-8-sig", newline="")
+    with stream:
+        result = import_products(
+            stream, fmt,
+            batch_size=batch_size,
+            image_root=image_root if images else None,
+            image_workers=image_workers,
+        )
+
+    for line, message in result.errors:
+        click.echo(f"wiersz {line}: {message}", err=True)
+    click.echo(
+        f"Wczytano: {result.read}, dodano: {result.inserted}, zaktualizowano: {result.updated}, "
+        f"odrzucono: {result.rejected}, zdjęcia: {result.images} "
+        f"w {result.elapsed:.2f} s ({result.rows_per_second:.0f} wierszy/s)"
+    )
+
+
+orders_cli = AppGroup("orders", help="Zamówienia.")
+
+
+@orders_cli.command("export")
+@click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]), default="csv", show_default=True)
+@click.option("--status", help="Only orders with this status.")
+@click.option("--from", "date_from", help="First day, YYYY-MM-DD.")
+@click.option("--to", "date_to", help="Last day (inclusive), YYYY-MM-DD.")
+@click.option("--batch-size", default=1000, show_default=True)
+@click.option("--output", "-o", type=click.File("w", encoding="utf-8", lazy=True), default="-",
+              help="Target file; standard output by default.")
+def orders_export(fmt, status, date_from, date_to, batch_size, output):
+    """Stream orders with their lines as CSV or JSON Lines."""
+    from .order_export import iter_export
+    from .orders import parse_filters
+
+    filters = parse_filters({"status": status, "date_from": date_from, "date_to": date_to})
+    with output:
+        for chunk in iter_export(fmt, filters, batch_size):
+            output.write(chunk)
+
+
+analytics_cli = AppGroup("analytics", help="Raporty sprzedaży.")
+
+
+@analytics_cli.command("rebuild")
+def analytics_rebuild():
+    """Recompute the daily sales rollups from all orders."""
+    from .analytics import rebuild
+
+    started = time.perf_counter()
+    rows = rebuild()
+    click.echo(f"Zapisano {rows} wierszy zestawień w {time.perf_counter() - started:.2f} s")
+
+
+users_cli = AppGroup("users", help="Użytkownicy.")
+
+
+@users_cli.command("create-admin")
+@click.option("--username", default="admin", show_default=True)
+@click.option("--password", prompt=True, hide_input=True, confirmation_prompt=True)
+@click.option("--email", default="admin@example.com", show_default=True)
+def users_create_admin(username, password, email):
+    """Create an administrator account, or promote an existing user."""
+    from .models import User
+
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        user = User(
+            username=username,
+            first_name="Admin",
+            last_name="User",
+            street="Testowa",
+            house_number="1",
+            postal_code="00-000",
+            city="Nowhere",
+            email=email,
+        )
+        db.session.add(user)
+    user.role = "admin"
+    user.set_password(password)
+    db.session.commit()
+    click.echo(f"Administrator: {username}")
+
+
+jobs_cli = AppGroup("jobs", help="Zadania w tle.")
+
+
+@jobs_cli.command("worker")
+@click.option("--threads", default=2, show_default=True, help="Jobs processed concurrently.")
+@click.option("--poll", default=1.0, show_default=True, help="Seconds between polls of an empty queue.")
+@click.option("--drain", is_flag=True, help="Exit once no job is due.")
+def jobs_worker(threads, poll, drain):
+    """Process queued jobs (confirmation mail, BLIK payments)."""
+    import signal
+    import threading
+
+    from flask import current_app
+
+    from .jobs import run_workers
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    app = current_app._get_current_object()
+    processed = run_workers(app, threads=threads, drain=drain, poll_interval=poll, stop=stop)
+    click.echo(f"Wykonano zadań: {processed}")
+
+
+@jobs_cli.command("status")
+def jobs_status():
+    """Show queued, running and dead jobs."""
+    from .jobs import counts
+
+    for status, count in sorted(counts().items()):
+        click.echo(f"{status}: {count}")
+
+
+@jobs_cli.command("retry-dead")
+@click.argument("ids", nargs=-1, type=int)
+def jobs_retry_dead(ids):
+    """Queue dead jobs again (all of them, or the given dead_job ids)."""
+    from .jobs import retry_dead
+
+    click.echo(f"Ponowiono zadań: {retry_dead(ids)}")
+
+
+@jobs_cli.command("smtp")
+@click.option("--host", default="127.0.0.1", show_default=True)
+@click.option("--port", default=8025, show_default=True)
+@click.option("--directory", default="instance/mail", show_default=True,
+              help="Where received messages are saved as .eml files.")
+def jobs_smtp(host, port, directory):
+    """Run a local SMTP stand-in that saves mail instead of sending it."""
+    from .mail import MailboxServer
+
+    with MailboxServer((host, port), directory) as server:
+        click.echo(f"SMTP na {host}:{port}, wiadomości w {directory}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+inventory_cli = AppGroup("inventory", help="Stany magazynowe.")
+
+
+@inventory_cli.command("set")
+@click.argument("product_id", type=int)
+@click.argument("available", type=click.IntRange(min=0), required=False)
+def inventory_set(product_id, available):
+    """Set a product's available units; without AVAILABLE stop tracking it."""
+    from .inventory import set_stock
+
+    set_stock(product_id, available)
+    db.session.commit()
+    click.echo(f"Produkt {product_id}: {'bez limitu' if available is None else available}")
+
+
+@inventory_cli.command("release-expired")
+def inventory_release_expired():
+    """Return expired cart reservations to stock (run every few minutes)."""
+    from .inventory import release_expired
+
+    released = release_expired()
+    db.session.commit()
+    click.echo(f"Zwolniono sztuk: {released}")
+
+
+assets_cli = AppGroup("assets", help="Pliki statyczne.")
+
+
+@assets_cli.command("build")
+def assets_build():
+    """Fingerprint and precompress static files into static/dist."""
+    from flask import current_app
+
+    from .assets import build
+
+    manifest = build(current_app.static_folder)
+    click.echo(f"Plików: {len(manifest['files'])}, skompresowanych: {len(manifest['compressed'])}")
+
+
+replica_cli = AppGroup("replica", help="Replika bazy danych.")
+
+
+@replica_cli.command("sync")
+@click.option("--interval", default=0.0, show_default=True,
+              help="Copy again every N seconds; 0 copies once and exits.")
+def replica_sync(interval):
+    """Copy the primary database into the read replica (local stand-in for replication)."""
+    from .database import sync_replica
+
+    if not interval:
+        started = time.perf_counter()
+        pages = sync_replica(db)
+        click.echo(f"Skopiowano stron: {pages} w {(time.perf_counter() - started) * 1000:.0f} ms")
+        return
+    click.echo(f"Kopiowanie do repliki co {interval:g} s")
+    try:
+        while True:
+            started = time.monotonic()
+            sync_replica(db)
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+    except KeyboardInterrupt:
+        pass
+
+
+def register_commands(app):
+    app.cli.add_command(images_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(carts_cli)
+    app.cli.add_command(products_cli)
+    app.cli.add_command(orders_cli)
+    app.cli.add_command(analytics_cli)
+    app.cli.add_command(users_cli)
+    app.cli.add_command(jobs_cli)
+    app.cli.add_command(inventory_cli)
+    app.cli.add_command(assets_cli)
+    app.cli.add_command(replica_cli)
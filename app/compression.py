@@ -0,0 +1,77 @@
+import gzip
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+
+COMPRESSIBLE = {
+    "text/html", "text/plain", "text/css", "text/csv", "text/xml",
+    "application/json", "application/javascript", "application/xml", "image/svg+xml",
+}
+
+
+class Compression:
+    # Compresses dynamic responses (HTML, JSON) above COMPRESS_MIN_SIZE
+    # with Brotli or gzip, whichever the client prefers. Dynamic bodies are
+    # compressed on every request, so the levels favour speed over the
+    # last few percent; static files come precompressed from
+    # `flask assets build`. File and streamed responses are left alone.
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("COMPRESS_ENABLED", True)
+        app.config.setdefault("COMPRESS_MIN_SIZE", 1024)
+        app.config.setdefault("COMPRESS_GZIP_LEVEL", 6)
+        app.config.setdefault("COMPRESS_BROTLI_QUALITY", 4)
+        app.extensions["compression"] = self
+        if not app.config["COMPRESS_ENABLED"]:
+            return
+        self.min_size = app.config["COMPRESS_MIN_SIZE"]
+        self.gzip_level = app.config["COMPRESS_GZIP_LEVEL"]
+        self.brotli_quality = app.config["COMPRESS_BROTLI_QUALITY"]
+        app.after_request(self._after_request)
+
+    def _encoding(self):
+        accepted = request.accept_encodings
+        if brotli is not None and accepted["br"]:
+            return "br"
+        if accepted["gzip"]:
+            return "gzip"
+        return None
+
+    def _after_request(self, response):
+        if (response.direct_passthrough or response.is_streamed
+                or not 200 <= response.status_code < 300 or response.status_code in (204, 206)
+                or response.mimetype not in COMPRESSIBLE
+                or "Content-Encoding" in response.headers):
+            return response
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+
+        response.vary.add("Accept-Encoding")
+        encoding = self._encoding()
+        if encoding is None:
+            return response
+        if encoding == "br":
+            data = brotli.compress(data, quality=self.brotli_quality)
+        else:
+            data = gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+        response.set_data(data)
+        response.headers["Content-Encoding"] = encoding
+        # The compressed bytes differ from the identity ones, so a strong
+        # validator would be wrong; weak ones still match If-None-Match.
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+
+compression = Compression()
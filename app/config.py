@@ -0,0 +1,64 @@
+import os
+
+
+def _int(name, default):
+    return int(os.environ.get(name, default))
+
+
+class Config:
+    SECRET_KEY = os.environ.get("SECRET_KEY", "supersecretkey")
+
+    SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL", "sqlite:///../data/mini_shop.db")
+    # Optional read replica; see database.py. `flask replica sync` keeps a
+    # local SQLite copy of the primary up to date.
+    SQLALCHEMY_BINDS = {"replica": os.environ["DATABASE_REPLICA_URL"]} if os.environ.get("DATABASE_REPLICA_URL") else {}
+    REPLICA_PIN_SECONDS = _int("REPLICA_PIN_SECONDS", 5)
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        # One pool per process. Threaded workers each hold at most one
+        # connection per request, so size the pool to the thread count.
+        "pool_size": _int("DB_POOL_SIZE", 10),
+        "max_overflow": _int("DB_MAX_OVERFLOW", 10),
+        "pool_timeout": _int("DB_POOL_TIMEOUT", 30),
+        "pool_recycle": -1,
+        "connect_args": {
+            # Seconds pysqlite waits on a locked database before raising
+            # "database is locked"; also set as busy_timeout below.
+            "timeout": _int("DB_BUSY_TIMEOUT_MS", 15000) / 1000,
+            "check_same_thread": False,
+        },
+    }
+    # Applied to every new SQLite connection (see database.py).
+    SQLITE_PRAGMAS = {
+        "journal_mode": os.environ.get("SQLITE_JOURNAL_MODE", "WAL"),
+        "synchronous": os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL"),
+        "busy_timeout": _int("DB_BUSY_TIMEOUT_MS", 15000),
+        "mmap_size": _int("SQLITE_MMAP_SIZE", 256 * 1024 * 1024),
+        "cache_size": _int("SQLITE_CACHE_SIZE", -16 * 1024),
+        "temp_store": "MEMORY",
+    }
+
+    # Werkzeug method string or "bcrypt:<rounds>"; see passwords.py.
+    PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    PASSWORD_HASH_WORKERS = _int("PASSWORD_HASH_WORKERS", 1)
+
+    # Background jobs (jobs.py, `flask jobs worker`).
+    JOBS_MAX_ATTEMPTS = _int("JOBS_MAX_ATTEMPTS", 5)
+    JOBS_BACKOFF_SECONDS = _int("JOBS_BACKOFF_SECONDS", 10)
+    JOBS_BACKOFF_MAX_SECONDS = _int("JOBS_BACKOFF_MAX_SECONDS", 3600)
+    JOBS_LOCK_TIMEOUT = _int("JOBS_LOCK_TIMEOUT", 600)
+
+    # How long units added to a cart stay held for it (inventory.py).
+    STOCK_RESERVATION_MINUTES = _int("STOCK_RESERVATION_MINUTES", 15)
+
+    # Outgoing mail; `flask jobs smtp` serves a local stand-in on 8025.
+    MAIL_SERVER = os.environ.get("MAIL_SERVER", "localhost")
+    MAIL_PORT = _int("MAIL_PORT", 8025)
+    MAIL_SENDER = os.environ.get("MAIL_SENDER", "Mini Shop <sklep@mini-shop.local>")
+    MAIL_TIMEOUT = _int("MAIL_TIMEOUT", 10)
+
+    CATALOG_PAGE_SIZE = 24
+    CATALOG_MAX_PAGE_SIZE = 96
+    ORDERS_PAGE_SIZE = 50
+    IMAGE_WIDTHS = (160, 320, 640, 960)
+    IMAGE_WEBP_QUALITY = 75
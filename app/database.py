@@ -0,0 +1,118 @@
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import current_app, g, has_app_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+
+# Name of the optional read-replica bind (SQLALCHEMY_BINDS). Views wrapped
+# in replica_reads send their plain SELECTs there; writes, and every read
+# after a write in the same request, stay on the primary. A client that
+# wrote something is pinned to the primary for REPLICA_PIN_SECONDS, so the
+# page it is redirected to (its cart, its new order) never comes from a
+# replica that has not caught up yet.
+REPLICA = "replica"
+PIN_KEY = "db_primary_until"
+
+
+def apply_sqlite_pragmas(engine, pragmas):
+    if engine.dialect.name != "sqlite" or not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def dispose_after_fork(engine):
+    # Pooled connections must never be shared between a pre-fork master and
+    # its workers; each child starts with an empty pool instead.
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=lambda: engine.dispose(close=False))
+
+
+def configure_engine(app, db):
+    pragmas = app.config.get("SQLITE_PRAGMAS") or {}
+    with app.app_context():
+        for key, engine in db.engines.items():
+            if key == REPLICA:
+                # A write that reaches the replica by mistake fails instead
+                # of silently diverging from the primary.
+                apply_sqlite_pragmas(engine, dict(pragmas, query_only=1))
+            else:
+                apply_sqlite_pragmas(engine, pragmas)
+            dispose_after_fork(engine)
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if clause is not None and clause.is_select and not self._flushing:
+                if not self.info.get("wrote") and has_app_context() and g.get("db_replica"):
+                    return self._db.engines[REPLICA]
+            else:
+                # DML, flushes and raw connections: from here on this
+                # session reads its own writes from the primary.
+                self.info["wrote"] = True
+        return super().get_bind(mapper, clause, bind, **kwargs)
+
+
+def replica_reads(view):
+    """Let the view's SELECTs go to the read replica, unless this client
+    wrote something in the last REPLICA_PIN_SECONDS."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if REPLICA in current_app.config["SQLALCHEMY_BINDS"] and session.get(PIN_KEY, 0) <= time.time():
+            g.db_replica = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@contextmanager
+def primary():
+    """Read from the primary inside the block, even in a replica_reads view."""
+    previous = g.pop("db_replica", False)
+    try:
+        yield
+    finally:
+        if previous:
+            g.db_replica = previous
+
+
+def configure_routing(app, db):
+    if REPLICA not in app.config["SQLALCHEMY_BINDS"]:
+        return
+
+    @app.after_request
+    def pin_to_primary(response):
+        if db.session.registry.has() and db.session.info.get("wrote"):
+            session[PIN_KEY] = int(time.time()) + app.config["REPLICA_PIN_SECONDS"]
+        return response
+
+
+def sync_replica(db):
+    """Copy the primary into the replica with SQLite's online backup API.
+
+    A local stand-in for real replication: each call copies the whole
+    database, and readers of the replica (WAL) keep their snapshot until
+    it completes. Returns the number of pages copied.
+    """
+    primary_engine, replica_engine = db.engines[None], db.engines[REPLICA]
+    if primary_engine.dialect.name != "sqlite" or replica_engine.dialect.name != "sqlite":
+        raise RuntimeError("sync_replica copies SQLite files only")
+    timeout = current_app.config["SQLALCHEMY_ENGINE_OPTIONS"].get("connect_args", {}).get("timeout", 5)
+    source = sqlite3.connect(primary_engine.url.database, timeout=timeout)
+    target = sqlite3.connect(replica_engine.url.database, timeout=timeout)
+    try:
+        source.backup(target)
+        return target.execute("PRAGMA page_count").fetchone()[0]
+    finally:
+        target.close()
+        source.close()
@@ -1,6 +1,6 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, FloatField, TextAreaField, SubmitField, SelectField, FileField
-from wtforms.validators import DataRequired, Length, Email, Regexp
+from wtforms import StringField, PasswordField, FloatField, IntegerField, TextAreaField, SubmitField, SelectField, FileField
+from wtforms.validators import DataRequired, Length, Email, Regexp, NumberRange, Optional
 from flask_wtf.file import FileAllowed
 
 class ProductForm(FlaskForm):
@@ -19,6 +19,8 @@ class ProductForm(FlaskForm):
     description = TextAreaField("Opis")
     properties = TextAreaField("Właściwości / składniki")
     preparation = TextAreaField("Sposób przygotowania")
+    # Empty: the product is not tracked and never runs out.
+    stock = IntegerField("Dostępna ilość (puste = bez limitu)", validators=[Optional(), NumberRange(min=0)])
     submit = SubmitField("Dodaj produkt")
 
 class LoginForm(FlaskForm):
@@ -0,0 +1,60 @@
+from flask import current_app, get_template_attribute
+from markupsafe import Markup
+
+from .cache import MISSING, LRUCache
+
+
+TEMPLATE = "_product_fragments.html"
+NAMES = ("card", "detail_media", "detail_summary", "detail_info")
+
+
+class FragmentCache:
+    # Rendered HTML of the macros in _product_fragments.html: the parts of
+    # product markup that depend on the product alone. Entries are keyed
+    # by (macro, product id) and carry the product version they were
+    # rendered from, so an edit seen through a fresher snapshot re-renders
+    # even in a worker that missed the invalidation. The admin routes and
+    # the importer drop a product's entries as soon as it changes.
+
+    def __init__(self, app=None):
+        self.local = None
+        self.renders = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("FRAGMENT_CACHE_SIZE", 8192)
+        self.local = LRUCache(maxsize=app.config["FRAGMENT_CACHE_SIZE"])
+        app.add_template_global(self.render, "product_fragment")
+        app.extensions["fragment_cache"] = self
+
+    def _render(self, name, product):
+        self.renders += 1
+        return Markup(get_template_attribute(TEMPLATE, name)(product))
+
+    def render(self, name, product):
+        # With template auto-reload (debug) edited templates must show up
+        # immediately, so fragments are always rendered fresh.
+        if not self.local.maxsize or current_app.jinja_env.auto_reload:
+            return self._render(name, product)
+        key = (name, product.id)
+        entry = self.local.get(key)
+        if entry is not MISSING and entry[0] == product.version:
+            return entry[1]
+        html = self._render(name, product)
+        self.local.set(key, (product.version, html))
+        return html
+
+    def invalidate_product(self, product_id):
+        for name in NAMES:
+            self.local.delete((name, product_id))
+
+    def invalidate_products(self, product_ids):
+        for product_id in product_ids:
+            self.invalidate_product(product_id)
+
+    def stats(self):
+        return dict(self.local.stats(), renders=self.renders)
+
+
+fragment_cache = FragmentCache()
@@ -0,0 +1,79 @@
+import hashlib
+
+from flask import current_app, make_response, request, session
+
+from . import carts
+
+
+def _templates_digest():
+    # Part of every ETag, so a deploy that changes the markup or the
+    # fingerprinted asset URLs it links retires the validators clients
+    # hold. Computed once per process, on first use.
+    digest = current_app.extensions.get("http_cache_templates")
+    if digest is None:
+        loader = current_app.jinja_env.loader
+        sha = hashlib.sha1()
+        for name in sorted(loader.list_templates()):
+            sha.update(name.encode())
+            sha.update(loader.get_source(current_app.jinja_env, name)[0].encode())
+        sha.update(current_app.extensions["assets"].digest.encode())
+        digest = current_app.extensions["http_cache_templates"] = sha.hexdigest()[:12]
+    return digest
+
+
+def personal_state():
+    """What base.html and the catalog templates render from the session."""
+    state = tuple(session.get(key) for key in ("user_id", "username", "role"))
+    cart = tuple(sorted(carts.load().items()))
+    if not cart and not any(state):
+        return ()
+    return state + cart
+
+
+def conditional(render, validators, last_modified=None, check_modified_since=True, personal=True):
+    """Answer a conditional GET with 304 before calling `render`.
+
+    `validators` identifies the catalog data the page shows (ids and
+    versions); the ETag also covers the visitor's session state, so a
+    shopper's cart badge never validates someone else's copy. Pages for
+    anonymous visitors without a cart are `public` (a CDN may store them
+    and revalidate), the rest `private`. Either way caches must revalidate
+    on every use. Pages with pending flash messages are not cached.
+
+    Pass check_modified_since=False where the newest timestamp cannot
+    prove the page unchanged (a listing loses rows without any of the
+    remaining ones changing); Last-Modified is then only informational.
+    Pass personal=False for responses that do not depend on the session
+    at all (the catalog API): the session is then never read, and the
+    response is public without Vary: Cookie.
+    """
+    if personal and session.get("_flashes"):
+        response = make_response(render())
+        response.cache_control.no_store = True
+        return response
+
+    state = personal_state() if personal else ()
+    key = repr((_templates_digest(), request.full_path, validators, state))
+    etag = hashlib.sha1(key.encode()).hexdigest()
+
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    elif (check_modified_since and last_modified is not None and not request.if_none_match
+          and request.if_modified_since is not None
+          and last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)):
+        response = current_app.response_class(status=304)
+    else:
+        response = make_response(render())
+
+    # Weak: the same page may go out gzip- or Brotli-compressed.
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    if state:
+        response.cache_control.private = True
+    else:
+        response.cache_control.public = True
+    if personal:
+        response.vary.add("Cookie")
+    return response
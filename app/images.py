@@ -0,0 +1,148 @@
+import hashlib
+import io
+import os
+
+from flask import current_app
+
+# Pillow is imported inside the functions that decode images: the template
+# filters below are needed on every page, image processing only on upload.
+
+
+FORMAT_EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp"}
+THUMBNAIL_WIDTH = 320
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+def images_dir():
+    path = current_app.config.get("IMAGE_DIR") or os.path.join(
+        current_app.root_path, "static", "images"
+    )
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def image_url(filename):
+    return f"/static/images/{filename}"
+
+
+def _open(data):
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as exc:
+        raise InvalidImage(str(exc)) from exc
+    if image.format not in FORMAT_EXTENSIONS:
+        raise InvalidImage(f"unsupported format {image.format}")
+    return image
+
+
+def _flatten(image):
+    from PIL import Image, ImageOps
+
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def _resize(image, width):
+    from PIL import Image
+
+    if image.width <= width:
+        return image
+    height = round(image.height * width / image.width)
+    return image.resize((width, height), Image.Resampling.LANCZOS)
+
+
+def build_derivatives(data, key):
+    # Writes <key>-<width>.webp for every configured width (never
+    # upscaling) plus a <key>-thumb.jpg fallback, and returns the widths.
+    image = _flatten(_open(data))
+    directory = images_dir()
+    quality = current_app.config["IMAGE_WEBP_QUALITY"]
+    widths = sorted({min(width, image.width) for width in current_app.config["IMAGE_WIDTHS"]})
+
+    for width in widths:
+        target = os.path.join(directory, f"{key}-{width}.webp")
+        if not os.path.exists(target):
+            _resize(image, width).save(target, "WEBP", quality=quality, method=6)
+
+    thumbnail = os.path.join(directory, f"{key}-thumb.jpg")
+    if not os.path.exists(thumbnail):
+        _resize(image, THUMBNAIL_WIDTH).save(
+            thumbnail, "JPEG", quality=75, optimize=True, progressive=True
+        )
+    return widths
+
+
+def content_key(data):
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def save_upload(file_storage):
+    return save_image(file_storage.read())
+
+
+def save_image(data):
+    # Stores the original under its content hash and builds derivatives;
+    # returns (url, key, widths) ready for the product row.
+    image = _open(data)
+    key = content_key(data)
+
+    filename = f"{key}.{FORMAT_EXTENSIONS[image.format]}"
+    path = os.path.join(images_dir(), filename)
+    if not os.path.exists(path):
+        with open(path, "wb") as f:
+            f.write(data)
+
+    widths = build_derivatives(data, key)
+    return image_url(filename), key, ",".join(map(str, widths))
+
+
+def backfill_product(product):
+    # Only local uploads can be processed; external URLs are left alone.
+    if not product.image_url or not product.image_url.startswith("/static/images/"):
+        return False
+    path = os.path.join(images_dir(), os.path.basename(product.image_url))
+    if not os.path.exists(path):
+        return False
+    with open(path, "rb") as f:
+        data = f.read()
+    key = content_key(data)
+    product.image_key = key
+    product.image_widths = ",".join(map(str, build_derivatives(data, key)))
+    return True
+
+
+def derivatives_missing(product):
+    # True when the product's WebP sizes or thumbnail are not on disk:
+    # never generated, or generated elsewhere (they are not versioned).
+    if not product.image_key or not product.image_widths:
+        return True
+    names = [f"{product.image_key}-{width}.webp" for width in product.image_widths.split(",")]
+    names.append(f"{product.image_key}-thumb.jpg")
+    directory = images_dir()
+    return not all(os.path.exists(os.path.join(directory, name)) for name in names)
+
+
+def srcset(product):
+    if not getattr(product, "image_key", None) or not product.image_widths:
+        return ""
+    return ", ".join(
+        f"{image_url(f'{product.image_key}-{width}.webp')} {width}w"
+        for width in product.image_widths.split(",")
+    )
+
+
+def thumbnail_url(product):
+    if getattr(product, "image_key", None):
+        return image_url(f"{product.image_key}-thumb.jpg")
+    return product.image_url
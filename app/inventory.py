@@ -0,0 +1,202 @@
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.sqlite import insert
+
+from . import db
+from .models import Stock, StockReservation
+
+
+# Stock.available counts units nobody holds. Adding to a cart moves units
+# from there into a StockReservation; checkout consumes the reservation
+# (taking whatever it does not cover straight from stock) and expired
+# reservations flow back. Every move is one conditional statement such as
+# UPDATE stock SET available = available - :n WHERE available >= :n, so
+# nothing is read and re-checked and concurrent checkouts never oversell;
+# the write lock is held only for those few statements.
+
+
+class OutOfStock(Exception):
+    def __init__(self, product_ids):
+        super().__init__(f"not enough stock for products {sorted(product_ids)}")
+        self.product_ids = product_ids
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _expiry():
+    return _utcnow() + timedelta(minutes=current_app.config["STOCK_RESERVATION_MINUTES"])
+
+
+def _tracked(product_ids):
+    return set(db.session.scalars(select(Stock.product_id).where(Stock.product_id.in_(product_ids))))
+
+
+def _decrement(product_id, quantity):
+    result = db.session.execute(
+        update(Stock)
+        .where(Stock.product_id == product_id, Stock.available >= quantity)
+        .values(available=Stock.available - quantity)
+    )
+    return result.rowcount > 0
+
+
+def _take(product_id, quantity):
+    # For tracked products. Expired reservations are normally returned by
+    # `flask inventory release-expired`; when stock looks short, return
+    # them first so abandoned carts never block a sale.
+    return _decrement(product_id, quantity) or (release_expired() > 0 and _decrement(product_id, quantity))
+
+
+def _give_back(quantities):
+    for product_id, quantity in quantities.items():
+        if quantity > 0:
+            db.session.execute(
+                update(Stock)
+                .where(Stock.product_id == product_id)
+                .values(available=Stock.available + quantity)
+            )
+
+
+def levels(product_ids):
+    """Units available for the given products; untracked ones are absent."""
+    if not product_ids:
+        return {}
+    rows = db.session.execute(
+        select(Stock.product_id, Stock.available).where(Stock.product_id.in_(product_ids))
+    )
+    return dict(rows.all())
+
+
+def set_stock(product_id, available):
+    """Set the available units; None stops tracking the product."""
+    if available is None:
+        db.session.execute(delete(StockReservation).where(StockReservation.product_id == product_id))
+        db.session.execute(delete(Stock).where(Stock.product_id == product_id))
+        return
+    stmt = insert(Stock).values(product_id=product_id, available=available)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=[Stock.product_id],
+        set_={"available": stmt.excluded.available},
+    ))
+
+
+def reserve(cart_id, product_id, quantity=1):
+    """Hold `quantity` more units for the cart. False when sold out.
+
+    Untracked products always succeed without a reservation. Any
+    activity extends all of the cart's reservations. The caller commits.
+    """
+    if not _decrement(product_id, quantity):
+        if not _tracked([product_id]):
+            return True
+        if not _take(product_id, quantity):
+            return False
+    expires_at = _expiry()
+    stmt = insert(StockReservation).values(
+        cart_id=cart_id, product_id=product_id, quantity=quantity, expires_at=expires_at
+    )
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=[StockReservation.cart_id, StockReservation.product_id],
+        set_={"quantity": StockReservation.quantity + stmt.excluded.quantity},
+    ))
+    db.session.execute(
+        update(StockReservation).where(StockReservation.cart_id == cart_id).values(expires_at=expires_at)
+    )
+    return True
+
+
+def release(cart_id, product_id=None, quantity=None):
+    """Return the cart's held units to stock: all of them, all of one
+    product, or `quantity` units of one product. The caller commits."""
+    held = StockReservation.cart_id == cart_id
+    if product_id is not None:
+        held &= StockReservation.product_id == product_id
+    if quantity is None:
+        rows = db.session.execute(
+            delete(StockReservation).where(held)
+            .returning(StockReservation.product_id, StockReservation.quantity)
+        ).all()
+        _give_back(dict(rows))
+        return
+    result = db.session.execute(
+        update(StockReservation)
+        .where(held, StockReservation.quantity >= quantity)
+        .values(quantity=StockReservation.quantity - quantity)
+    )
+    if result.rowcount:
+        _give_back({product_id: quantity})
+        db.session.execute(delete(StockReservation).where(held, StockReservation.quantity <= 0))
+
+
+def release_expired(now=None):
+    """Return every expired reservation to stock in one pass; returns the
+    number of units released. The caller commits."""
+    rows = db.session.execute(
+        delete(StockReservation)
+        .where(StockReservation.expires_at <= (now or _utcnow()))
+        .returning(StockReservation.product_id, StockReservation.quantity)
+    ).all()
+    released = Counter()
+    for product_id, quantity in rows:
+        released[product_id] += quantity
+    _give_back(released)
+    return sum(released.values())
+
+
+def move(from_cart_id, to_cart_id):
+    """Hand one cart's reservations over to another (cart merge on login)."""
+    rows = db.session.execute(
+        delete(StockReservation)
+        .where(StockReservation.cart_id == from_cart_id)
+        .returning(StockReservation.product_id, StockReservation.quantity)
+    ).all()
+    if not rows:
+        return
+    stmt = insert(StockReservation)
+    db.session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[StockReservation.cart_id, StockReservation.product_id],
+            set_={
+                "quantity": StockReservation.quantity + stmt.excluded.quantity,
+                "expires_at": stmt.excluded.expires_at,
+            },
+        ),
+        [
+            {"cart_id": to_cart_id, "product_id": product_id, "quantity": quantity, "expires_at": _expiry()}
+            for product_id, quantity in rows
+        ],
+    )
+
+
+def sell(cart_id, quantities):
+    """Take `quantities` ({product id: units}) out of stock for an order.
+
+    The cart's reservations are consumed first; what they do not cover
+    (they expired, or there is no cart) is taken from stock directly, and
+    what they over-cover goes back. Raises OutOfStock, leaving the
+    rollback to the caller, when a tracked product is short.
+    """
+    reserved = {}
+    if cart_id is not None:
+        reserved = dict(db.session.execute(
+            delete(StockReservation)
+            .where(StockReservation.cart_id == cart_id)
+            .returning(StockReservation.product_id, StockReservation.quantity)
+        ).all())
+
+    tracked = _tracked(list(quantities))
+    short = []
+    for product_id, quantity in quantities.items():
+        missing = quantity - reserved.pop(product_id, 0)
+        if missing < 0:
+            reserved[product_id] = -missing
+        elif missing and product_id in tracked and not _take(product_id, missing):
+            short.append(product_id)
+    _give_back(reserved)
+    if short:
+        raise OutOfStock(short)
@@ -0,0 +1,185 @@
+import json
+import os
+import random
+import socket
+import threading
+import traceback
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy import and_, delete, func, insert, or_, select, update
+
+from . import db
+from .models import DeadJob, Job
+
+
+HANDLERS = {}
+
+
+def handler(kind):
+    """Register the function that runs jobs of `kind`.
+
+    It is called with the payload as keyword arguments inside an app
+    context. Delivery is at least once (a crashed worker's job runs
+    again), so handlers must be safe to repeat.
+    """
+    def register(function):
+        HANDLERS[kind] = function
+        return function
+    return register
+
+
+def _utcnow():
+    # Naive UTC, like the CURRENT_TIMESTAMP values SQLite writes.
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def enqueue(kind, delay=0, max_attempts=None, **payload):
+    """Add a job to the current transaction; it runs once the caller commits."""
+    job = Job(
+        kind=kind,
+        payload=json.dumps(payload, ensure_ascii=False),
+        max_attempts=max_attempts or current_app.config["JOBS_MAX_ATTEMPTS"],
+        run_at=_utcnow() + timedelta(seconds=delay),
+    )
+    db.session.add(job)
+    return job
+
+
+def backoff(attempts):
+    # Exponential with jitter: base, 2*base, 4*base... capped; the jitter
+    # keeps jobs that failed together (an SMTP outage) from retrying
+    # together.
+    base = current_app.config["JOBS_BACKOFF_SECONDS"]
+    delay = min(current_app.config["JOBS_BACKOFF_MAX_SECONDS"], base * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def claim(worker_id):
+    """Atomically take the next due job, or None.
+
+    One UPDATE ... RETURNING picks and locks the row, so concurrent
+    workers never get the same job. Jobs left "running" longer than
+    JOBS_LOCK_TIMEOUT (a worker that died) are picked up again.
+    """
+    now = _utcnow()
+    stale = now - timedelta(seconds=current_app.config["JOBS_LOCK_TIMEOUT"])
+    candidate = (
+        select(Job.id)
+        .where(or_(
+            and_(Job.status == "pending", Job.run_at <= now),
+            and_(Job.status == "running", Job.locked_at < stale),
+        ))
+        .order_by(Job.run_at, Job.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    row = db.session.execute(
+        update(Job)
+        .where(Job.id == candidate)
+        .values(status="running", locked_at=now, locked_by=worker_id, attempts=Job.attempts + 1)
+        .returning(Job.id, Job.kind, Job.payload, Job.attempts, Job.max_attempts, Job.created_at)
+    ).first()
+    db.session.commit()
+    return row
+
+
+def _fail(job, error):
+    if job.attempts < job.max_attempts:
+        db.session.execute(
+            update(Job).where(Job.id == job.id).values(
+                status="pending",
+                run_at=_utcnow() + timedelta(seconds=backoff(job.attempts)),
+                locked_at=None,
+                locked_by=None,
+                last_error=error,
+            )
+        )
+    else:
+        db.session.execute(insert(DeadJob).values(
+            job_id=job.id, kind=job.kind, payload=job.payload, attempts=job.attempts,
+            error=error, created_at=job.created_at,
+        ))
+        db.session.execute(delete(Job).where(Job.id == job.id))
+    db.session.commit()
+
+
+def execute(job):
+    """Run one claimed job; returns True when it succeeded."""
+    try:
+        function = HANDLERS.get(job.kind)
+        if function is None:
+            raise LookupError(f"no handler for job kind {job.kind!r}")
+        function(**json.loads(job.payload))
+        db.session.execute(delete(Job).where(Job.id == job.id))
+        db.session.commit()
+        return True
+    except Exception:
+        db.session.rollback()
+        error = traceback.format_exc(limit=5)
+        current_app.logger.warning("Job %s (%s) attempt %s failed:\n%s",
+                                   job.id, job.kind, job.attempts, error)
+        _fail(job, error)
+        return False
+
+
+def work(app, stop, drain=False, poll_interval=1.0):
+    """Worker thread loop: claim and execute jobs until `stop` is set.
+
+    With drain=True it returns as soon as nothing is due.
+    """
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"
+    processed = 0
+    while not stop.is_set():
+        with app.app_context():
+            job = claim(worker_id)
+            if job is not None:
+                execute(job)
+                processed += 1
+                continue
+        if drain:
+            break
+        stop.wait(poll_interval)
+    return processed
+
+
+def run_workers(app, threads=1, drain=False, poll_interval=1.0, stop=None):
+    """Run `threads` worker loops; returns the number of jobs processed."""
+    stop = stop or threading.Event()
+    processed = [0] * threads
+
+    def loop(index):
+        processed[index] = work(app, stop, drain, poll_interval)
+
+    workers = [threading.Thread(target=loop, args=(i,), name=f"jobs-{i}") for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            while worker.is_alive():
+                worker.join(0.5)
+    except KeyboardInterrupt:
+        stop.set()
+        for worker in workers:
+            worker.join()
+    return sum(processed)
+
+
+def counts():
+    by_status = dict(db.session.execute(select(Job.status, func.count()).group_by(Job.status)).all())
+    by_status["dead"] = db.session.scalar(select(func.count()).select_from(DeadJob))
+    return by_status
+
+
+def retry_dead(ids=None):
+    """Move dead jobs (all, or the given dead_job ids) back into the queue."""
+    query = select(DeadJob)
+    if ids:
+        query = query.where(DeadJob.id.in_(ids))
+    dead = db.session.scalars(query).all()
+    for job in dead:
+        db.session.add(Job(kind=job.kind, payload=job.payload,
+                           max_attempts=current_app.config["JOBS_MAX_ATTEMPTS"]))
+        db.session.delete(job)
+    db.session.commit()
+    return len(dead)
@@ -0,0 +1,85 @@
+import itertools
+import os
+import smtplib
+import socketserver
+import time
+from email.message import EmailMessage
+
+from flask import current_app
+
+
+def send(to, subject, body):
+    message = EmailMessage()
+    message["From"] = current_app.config["MAIL_SENDER"]
+    message["To"] = to
+    message["Subject"] = subject
+    message.set_content(body)
+    config = current_app.config
+    with smtplib.SMTP(config["MAIL_SERVER"], config["MAIL_PORT"], timeout=config["MAIL_TIMEOUT"]) as smtp:
+        smtp.send_message(message)
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    # Just enough SMTP for smtplib: HELO/EHLO, MAIL, RCPT, DATA, RSET,
+    # NOOP, QUIT. No auth, no TLS, no relaying; every message is accepted.
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.reply("220 mini-shop SMTP stand-in")
+        recipients = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode("utf-8", "replace").strip()
+            verb = command[:4].upper()
+            if verb in ("HELO", "EHLO"):
+                self.reply("250 mini-shop")
+            elif verb == "MAIL":
+                recipients = []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command.partition(":")[2].strip())
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                self.server.store(self.read_data())
+                self.reply("250 OK")
+            elif verb == "RSET":
+                recipients = []
+                self.reply("250 OK")
+            elif verb == "NOOP":
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+    def read_data(self):
+        lines = []
+        for line in self.rfile:
+            if line in (b".\r\n", b".\n"):
+                break
+            lines.append(line[1:] if line.startswith(b"..") else line)
+        return b"".join(lines)
+
+
+class MailboxServer(socketserver.ThreadingTCPServer):
+    """Local SMTP stand-in that saves every message as an .eml file."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, directory):
+        super().__init__(address, _SMTPHandler)
+        self.directory = directory
+        self._numbers = itertools.count(1)
+        os.makedirs(directory, exist_ok=True)
+
+    def store(self, data):
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(self._numbers)}.eml"
+        with open(os.path.join(self.directory, name), "wb") as f:
+            f.write(data)
@@ -0,0 +1,266 @@
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from flask import (
+    Response, abort, before_render_template, current_app, g, has_app_context, request,
+    template_rendered,
+)
+from sqlalchemy import event
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SLOW_QUERY_TEXT = 500
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] += amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield f"{self.name}{_labels(self.labels, labels)} {_number(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (non-cumulative) + overflow, sum].
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def samples(self):
+        with self._lock:
+            series = {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+        for labels, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket{_labels(self.labels, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labels, labels)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labels, labels)} {cumulative}"
+
+
+class Metrics:
+    # Request, SQL and template instrumentation exposed in the Prometheus
+    # text format. Values live in the worker process that recorded them:
+    # with several gunicorn workers each scrape sees one worker, so scrape
+    # the workers individually or run a single worker behind the scraper.
+
+    def __init__(self, app=None, db=None):
+        self.metrics = []
+        self.requests = self._add(Counter(
+            "shop_http_requests_total", "HTTP requests by endpoint, method and status.",
+            ("endpoint", "method", "status")))
+        self.request_duration = self._add(Histogram(
+            "shop_http_request_duration_seconds", "Time spent producing a response.",
+            ("endpoint", "method")))
+        self.request_queries = self._add(Histogram(
+            "shop_http_request_queries", "SQL statements issued per request.",
+            ("endpoint",), QUERY_COUNT_BUCKETS))
+        self.request_sql_duration = self._add(Histogram(
+            "shop_http_request_sql_duration_seconds", "Time spent in SQL per request.",
+            ("endpoint",)))
+        self.template_duration = self._add(Histogram(
+            "shop_template_render_duration_seconds", "Jinja template render time.",
+            ("template",)))
+        self.sql_duration = self._add(Histogram(
+            "shop_sql_query_duration_seconds", "Duration of individual SQL statements.",
+            (), (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)))
+        self.slow_queries = self._add(Counter(
+            "shop_sql_slow_queries_total", "SQL statements slower than SLOW_QUERY_MS.", ("endpoint",)))
+        self.logger = None
+        if app is not None:
+            self.init_app(app, db)
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def init_app(self, app, db):
+        app.config.setdefault("METRICS_ENABLED", True)
+        app.config.setdefault("METRICS_TOKEN", None)
+        app.config.setdefault("SLOW_QUERY_MS", 200)
+        app.config.setdefault("PROFILE_REQUESTS", False)
+        app.config.setdefault("PROFILE_HEADER", "X-Profile")
+        app.config.setdefault("PROFILE_DIR", os.path.join(app.instance_path, "profiles"))
+        app.extensions["metrics"] = self
+        if not app.config["METRICS_ENABLED"]:
+            return
+
+        self.logger = app.logger
+        self.slow_query_seconds = app.config["SLOW_QUERY_MS"] / 1000
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        app.add_url_rule("/metrics", "metrics", self.view)
+        with app.app_context():
+            for engine in db.engines.values():
+                self.instrument_engine(engine)
+
+    def instrument_engine(self, engine):
+        @event.listens_for(engine, "before_cursor_execute")
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            elapsed = time.perf_counter() - conn.info["query_started"].pop()
+            self.sql_duration.observe(elapsed)
+            endpoint = None
+            if has_app_context() and "request_started" in g:
+                g.sql_queries += 1
+                g.sql_seconds += elapsed
+                endpoint = g.metrics_endpoint
+            if elapsed >= self.slow_query_seconds:
+                self.slow_queries.inc(endpoint or "")
+                self.logger.warning(
+                    "Slow query (%.1f ms, %s): %s", elapsed * 1000, endpoint or "-",
+                    " ".join(statement.split())[:SLOW_QUERY_TEXT],
+                )
+
+    def _before_render(self, app, template, context, **extra):
+        if has_app_context():
+            g.setdefault("render_started", []).append(time.perf_counter())
+
+    def _after_render(self, app, template, context, **extra):
+        if not has_app_context() or not g.get("render_started"):
+            return
+        elapsed = time.perf_counter() - g.render_started.pop()
+        self.template_duration.observe(elapsed, template.name or "<string>")
+        if "request_started" in g and not g.render_started:
+            # Only outermost renders count towards the request total.
+            g.template_seconds += elapsed
+
+    def _before_request(self):
+        g.request_started = time.perf_counter()
+        # Unmatched URLs share one label so 404 scans cannot blow up the
+        # number of series.
+        g.metrics_endpoint = request.endpoint or "unmatched"
+        g.sql_queries = 0
+        g.sql_seconds = 0.0
+        g.template_seconds = 0.0
+        if self._profiling():
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    def _after_request(self, response):
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.disable()
+            try:
+                response.headers["X-Profile-File"] = self._dump_profile(profiler)
+            except OSError:
+                self.logger.exception("Could not save the request profile")
+        if "request_started" not in g:
+            return response
+
+        elapsed = time.perf_counter() - g.request_started
+        endpoint = g.metrics_endpoint
+        self.requests.inc(endpoint, request.method, response.status_code)
+        self.request_duration.observe(elapsed, endpoint, request.method)
+        self.request_queries.observe(g.sql_queries, endpoint)
+        self.request_sql_duration.observe(g.sql_seconds, endpoint)
+        # Streamed bodies (exports) are produced after this point, so their
+        # timings cover the work up to the first byte only.
+        response.headers.add(
+            "Server-Timing",
+            f'app;dur={elapsed * 1000:.1f}, '
+            f'db;dur={g.sql_seconds * 1000:.1f};desc="{g.sql_queries} queries", '
+            f'tpl;dur={g.template_seconds * 1000:.1f}',
+        )
+        return response
+
+    def _profiling(self):
+        if current_app.config["PROFILE_REQUESTS"]:
+            return True
+        header = current_app.config["PROFILE_HEADER"]
+        # The header only works where profiling was allowed explicitly.
+        return bool(header and request.headers.get(header)
+                    and (current_app.debug or current_app.config.get("PROFILE_ALLOW_HEADER")))
+
+    def _dump_profile(self, profiler):
+        directory = current_app.config["PROFILE_DIR"]
+        os.makedirs(directory, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{threading.get_ident()}-{g.metrics_endpoint}.prof"
+        path = os.path.join(directory, name)
+        profiler.dump_stats(path)
+
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(25)
+        self.logger.info("Profile of %s %s saved to %s\n%s",
+                         request.method, request.path, path, summary.getvalue())
+        return name
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def view(self):
+        # Endpoint names and SQL timings are not for the public: without a
+        # token the endpoint only exists in debug mode.
+        token = current_app.config["METRICS_TOKEN"]
+        if not token:
+            if not current_app.debug:
+                abort(404)
+        elif request.headers.get("Authorization") != f"Bearer {token}":
+            abort(401)
+        return Response(self.render(), mimetype="text/plain; version=0.0.4")
+
+
+metrics = Metrics()
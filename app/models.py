@@ -1,21 +1,35 @@
-from . import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from . import db, passwords
 
 class Product(db.Model):
     id = db.Column(db.Integer, primary_key=True)
+    # Supplier's product code; catalog imports upsert on it.
+    sku = db.Column(db.String(64), unique=True, index=True, nullable=True)
     name = db.Column(db.String(120), nullable=False)
     price = db.Column(db.Float, nullable=False)
     image_url = db.Column(db.String(255), nullable=True)  
-    category = db.Column(db.String(80), nullable=True)
+    image_key = db.Column(db.String(32), nullable=True)
+    image_widths = db.Column(db.String(64), nullable=True)
+    category = db.Column(db.String(80), nullable=True, index=True)
     description = db.Column(db.Text, nullable=True)
     properties = db.Column(db.Text, nullable=True)      
     preparation = db.Column(db.Text, nullable=True)     
+    # Validators for HTTP caching: updated_at feeds Last-Modified, version
+    # (bumped on every write, unlike the one-second timestamp) the ETag.
+    updated_at = db.Column(db.DateTime, nullable=False, default=db.func.now(),
+                           onupdate=db.func.now(), server_default=db.func.now())
+    version = db.Column(db.Integer, nullable=False, default=1,
+                        onupdate=db.literal_column("version + 1"), server_default="1")
+
+    __table_args__ = (
+        db.Index("ix_product_price_id", "price", "id"),
+        db.Index("ix_product_category_price_id", "category", "price", "id"),
+    )
 
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128), nullable=False)
+    password_hash = db.Column(db.String(255), nullable=False)
     role = db.Column(db.String(20), default="user")  
 
     first_name = db.Column(db.String(100), nullable=True)
@@ -27,17 +41,18 @@ class User(db.Model):
     email = db.Column(db.String(120), unique=True, nullable=True)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = passwords.hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        # May also upgrade password_hash to the configured method.
+        return passwords.check_password(self, password)
 
 class Order(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=True)  
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=True, index=True)
     total = db.Column(db.Float, nullable=False)
-    status = db.Column(db.String(20), default="nowe")
-    created_at = db.Column(db.DateTime, default=db.func.now())
+    status = db.Column(db.String(20), default="nowe", index=True)
+    created_at = db.Column(db.DateTime, default=db.func.now(), index=True)
 
     first_name = db.Column(db.String(100))
     last_name = db.Column(db.String(100))
@@ -50,15 +65,101 @@ class Order(db.Model):
     delivery_method = db.Column(db.String(20))   
     payment_method = db.Column(db.String(20))   
 
+    idempotency_key = db.Column(db.String(64), unique=True, index=True, nullable=True)
+
     user = db.relationship("User", backref="orders")
 
 
 class OrderItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey("order.id"), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey("order.id"), nullable=False, index=True)
     product_id = db.Column(db.Integer, db.ForeignKey("product.id"), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
     price = db.Column(db.Float, nullable=False) 
 
     order = db.relationship("Order", backref="items")
     product = db.relationship("Product")
+
+
+class Cart(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    token = db.Column(db.String(32), unique=True, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=True, unique=True)
+    updated_at = db.Column(db.DateTime, default=db.func.now(), onupdate=db.func.now(), index=True)
+
+
+class CartItem(db.Model):
+    cart_id = db.Column(db.Integer, db.ForeignKey("cart.id"), primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey("product.id"), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False)
+
+
+class SalesRollup(db.Model):
+    # Daily sales pre-aggregated along one dimension ("total", "product",
+    # "category", "payment", "delivery"); `key` is the product id, category
+    # or method name ("" for totals). Revenue is in grosze. Maintained by
+    # analytics.record_order() in the order's own transaction.
+    dimension = db.Column(db.String(16), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    key = db.Column(db.String(80), primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Integer, nullable=False, default=0)
+
+
+class Job(db.Model):
+    # Background work queued by jobs.enqueue(), usually in the same
+    # transaction as the change it follows up on. A worker claims a row by
+    # flipping it to "running"; finished jobs are deleted, failed ones go
+    # back to "pending" with a later run_at until max_attempts, then move
+    # to dead_job.
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(64), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default="{}")
+    status = db.Column(db.String(16), nullable=False, default="pending")
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=db.func.now())
+    locked_at = db.Column(db.DateTime, nullable=True)
+    locked_by = db.Column(db.String(64), nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=db.func.now())
+
+    __table_args__ = (
+        db.Index("ix_job_status_run_at", "status", "run_at"),
+    )
+
+
+class DeadJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, nullable=False)
+    kind = db.Column(db.String(64), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    attempts = db.Column(db.Integer, nullable=False)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=True)
+    failed_at = db.Column(db.DateTime, default=db.func.now())
+
+
+class Stock(db.Model):
+    # Units available for sale; products without a row are not tracked
+    # and never run out. Kept off the product row so that the constant
+    # decrements of a busy sale do not bump Product.version (and with it
+    # the ETags and cached fragments). Every change is a single
+    # conditional UPDATE in inventory.py; the CHECK is the last line of
+    # defence against overselling.
+    product_id = db.Column(db.Integer, db.ForeignKey("product.id"), primary_key=True)
+    available = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.CheckConstraint("available >= 0", name="ck_stock_available"),
+    )
+
+
+class StockReservation(db.Model):
+    # Units taken out of stock.available for a cart. Checkout turns them
+    # into the sale; expired ones go back to stock in bulk.
+    cart_id = db.Column(db.Integer, db.ForeignKey("cart.id"), primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey("product.id"), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
@@ -0,0 +1,97 @@
+import csv
+import io
+import json
+
+from sqlalchemy import select
+
+from . import db
+from .models import Order, OrderItem, Product
+from .orders import filter_orders
+
+
+ORDER_COLUMNS = (
+    "id", "created_at", "status", "user_id", "first_name", "last_name", "email",
+    "street", "house_number", "postal_code", "city", "delivery_method",
+    "payment_method", "total",
+)
+ITEM_COLUMNS = ("product_id", "product_name", "quantity", "price")
+CSV_HEADER = tuple(f"order_{name}" for name in ORDER_COLUMNS) + ITEM_COLUMNS
+
+FORMATS = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+}
+
+
+def _lines(filters, batch_size):
+    # One row per order line (orders without lines appear once, with
+    # empty item columns), in order id order. yield_per makes SQLAlchemy
+    # fetch in chunks from a cursor SQLite steps lazily, so memory stays
+    # at one chunk however many orders match. Ordering by order id alone
+    # lets SQLite walk the primary key (or the status index) and the
+    # order_item index without a sort step.
+    stmt = (
+        select(*(getattr(Order, name) for name in ORDER_COLUMNS),
+               OrderItem.product_id, Product.name, OrderItem.quantity, OrderItem.price)
+        .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+        .outerjoin(Product, Product.id == OrderItem.product_id)
+        .order_by(Order.id)
+        .execution_options(yield_per=batch_size)
+    )
+    return db.session.execute(filter_orders(stmt, filters))
+
+
+def _value(value):
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    if hasattr(value, "isoformat"):
+        return value.isoformat(sep=" ")
+    return value
+
+
+def iter_csv(filters, batch_size=1000):
+    """Yield the export as CSV text chunks of roughly `batch_size` lines."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    for rows in _lines(filters, batch_size).partitions():
+        writer.writerows([_value(value) for value in row] for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _order_document(row):
+    document = {name: row[i] for i, name in enumerate(ORDER_COLUMNS)}
+    if document["created_at"] is not None:
+        document["created_at"] = document["created_at"].isoformat()
+    document["items"] = []
+    return document
+
+
+def iter_jsonl(filters, batch_size=1000):
+    """Yield the export as JSON Lines, one order with its items per line."""
+    order_fields = len(ORDER_COLUMNS)
+    current = None
+    chunk = []
+    for rows in _lines(filters, batch_size).partitions():
+        for row in rows:
+            if current is None or current["id"] != row[0]:
+                if current is not None:
+                    chunk.append(json.dumps(current, ensure_ascii=False))
+                current = _order_document(row)
+            if row[order_fields] is not None:
+                current["items"].append(dict(zip(ITEM_COLUMNS, row[order_fields:])))
+        if chunk:
+            yield "\n".join(chunk) + "\n"
+            chunk = []
+    if current is not None:
+        yield json.dumps(current, ensure_ascii=False) + "\n"
+
+
+def iter_export(fmt, filters, batch_size=1000):
+    return (iter_csv if fmt == "csv" else iter_jsonl)(filters, batch_size)
@@ -0,0 +1,155 @@
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, selectinload
+
+from . import analytics, db, inventory, jobs, mail, pricing
+from .models import Order, OrderItem
+from .pagination import keyset_page
+
+
+ORDER_STATUSES = (
+    "nowe",
+    "oczekuje na płatność",
+    "w realizacji",
+    "Zapłacone - w realizacji",
+)
+AWAITING_PAYMENT = "oczekuje na płatność"
+PAID = "Zapłacone - w realizacji"
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_filters(args):
+    status = args.get("status") or None
+    return {
+        "status": status if status in ORDER_STATUSES else None,
+        "date_from": _parse_date(args.get("date_from")),
+        "date_to": _parse_date(args.get("date_to")),
+    }
+
+
+def filter_orders(query, filters):
+    if filters.get("status"):
+        query = query.filter(Order.status == filters["status"])
+    if filters.get("date_from"):
+        query = query.filter(Order.created_at >= filters["date_from"])
+    if filters.get("date_to"):
+        query = query.filter(Order.created_at < filters["date_to"] + timedelta(days=1))
+    return query
+
+
+def list_orders(filters, user_id=None, after=None, before=None):
+    query = Order.query.options(joinedload(Order.user))
+    if user_id is not None:
+        query = query.filter(Order.user_id == user_id)
+    query = filter_orders(query, filters)
+    # Ids grow with created_at, so paging by id gives "newest first"
+    # with a unique, index-friendly key.
+    return keyset_page(
+        query,
+        [Order.id],
+        current_app.config["ORDERS_PAGE_SIZE"],
+        descending=True,
+        after=after,
+        before=before,
+    )
+
+
+def find_by_idempotency_key(key):
+    if not key:
+        return None
+    return Order.query.filter_by(idempotency_key=key).first()
+
+
+def create_order(quote, idempotency_key=None, before_commit=None, cart_id=None, **fields):
+    # Returns (order, created). Everything that needs reading (cart,
+    # prices, address) is done by the caller beforehand, so the write
+    # transaction is just: one order row, a check of the quoted prices
+    # against the product rows, the stock moves (consuming
+    # `cart_id`'s reservations), one multi-row item insert, one multi-row
+    # sales rollup upsert, the follow-up jobs, whatever `before_commit`
+    # adds, commit. Slow follow-up work (mail, payment confirmation) runs
+    # later in `flask jobs worker`.
+    # A concurrent duplicate loses on the unique idempotency key and gets
+    # the winner's order back. Raises inventory.OutOfStock or
+    # pricing.PriceChanged, with nothing written, when a product has sold
+    # out or its price is not the quoted one.
+    existing = find_by_idempotency_key(idempotency_key)
+    if existing is not None:
+        return existing, False
+
+    order = Order(total=quote.total / 100, idempotency_key=idempotency_key or None, **fields)
+    try:
+        db.session.add(order)
+        db.session.flush()
+        pricing.check_current(quote)
+        inventory.sell(cart_id, {line.product.id: line.quantity for line in quote.lines})
+        db.session.execute(insert(OrderItem), [
+            {
+                "order_id": order.id,
+                "product_id": line.product.id,
+                "quantity": line.quantity,
+                "price": line.unit_price / 100,
+            }
+            for line in quote.lines
+        ])
+        analytics.record_order(order, quote)
+        jobs.enqueue("orders.send_confirmation", order_id=order.id)
+        if before_commit is not None:
+            before_commit(order)
+        db.session.commit()
+    except (inventory.OutOfStock, pricing.PriceChanged):
+        db.session.rollback()
+        raise
+    except IntegrityError:
+        db.session.rollback()
+        existing = find_by_idempotency_key(idempotency_key)
+        if existing is None:
+            raise
+        return existing, False
+    return order, True
+
+
+def get_order_with_items(order_id):
+    return (
+        Order.query
+        .options(selectinload(Order.items).joinedload(OrderItem.product))
+        .filter(Order.id == order_id)
+        .first()
+    )
+
+
+@jobs.handler("orders.send_confirmation")
+def send_confirmation(order_id):
+    order = get_order_with_items(order_id)
+    if order is None:
+        return
+    recipient = order.email or (order.user.email if order.user else None)
+    if not recipient:
+        return
+    mail.send(
+        recipient,
+        f"Potwierdzenie zamówienia nr {order.id}",
+        # Straight from the Jinja environment: the app's context processors
+        # (cart badge) need a request, and a worker has none.
+        current_app.jinja_env.get_template("email/order_confirmation.txt").render(order=order),
+    )
+
+
+@jobs.handler("orders.confirm_blik")
+def confirm_blik(order_id):
+    # Stand-in for the payment provider's confirmation: the order moves
+    # from awaiting payment to paid. Conditional, so a repeat is harmless.
+    db.session.execute(
+        update(Order)
+        .where(Order.id == order_id, Order.status == AWAITING_PAYMENT)
+        .values(status=PAID)
+    )
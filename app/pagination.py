@@ -0,0 +1,104 @@
+import base64
+import json
+import math
+
+from sqlalchemy import tuple_
+
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _cursor_type(column):
+    # The JSON type a cursor value must have for this column; anything
+    # encoded with str() (dates) comes back as a string.
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return str
+    if python_type is int:
+        return int
+    if python_type is float:
+        return (int, float)
+    return str
+
+
+def decode_cursor(token, columns):
+    # None (start from the first page) for anything that is not a cursor
+    # encode_cursor() could have produced for these columns; a tampered
+    # value must never reach the WHERE clause as an unbindable parameter.
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or len(values) != len(columns):
+        return None
+    for value, column in zip(values, columns):
+        if isinstance(value, bool) or not isinstance(value, _cursor_type(column)):
+            return None
+        if isinstance(value, float) and not math.isfinite(value):
+            return None
+    return values
+
+
+class Page:
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def keyset_page(query, columns, per_page, descending=False, after=None, before=None):
+    # Keyset (seek) pagination: every column in `columns` is sorted in the
+    # same direction and the last one must be unique, so the row-value
+    # comparison picks up exactly where the previous page ended and SQLite
+    # can answer it from the index without an OFFSET scan.
+    def key(row):
+        return [getattr(row, column.key) for column in columns]
+
+    row_key = tuple_(*columns)
+    after = decode_cursor(after, columns)
+    before = decode_cursor(before, columns) if after is None else None
+
+    if before is not None:
+        condition = row_key > tuple_(*before) if descending else row_key < tuple_(*before)
+        order = [column.asc() if descending else column.desc() for column in columns]
+        rows = query.filter(condition).order_by(*order).limit(per_page + 1).all()
+        has_prev = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        has_next = True
+    else:
+        if after is not None:
+            condition = row_key < tuple_(*after) if descending else row_key > tuple_(*after)
+            query = query.filter(condition)
+        order = [column.desc() if descending else column.asc() for column in columns]
+        rows = query.order_by(*order).limit(per_page + 1).all()
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        has_prev = after is not None
+
+    if not rows:
+        return Page([])
+    return Page(
+        rows,
+        next_cursor=encode_cursor(key(rows[-1])) if has_next else None,
+        prev_cursor=encode_cursor(key(rows[0])) if has_prev else None,
+    )
@@ -0,0 +1,95 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+# PASSWORD_HASH_METHOD takes Werkzeug's method strings ("scrypt:32768:8:1",
+# "pbkdf2:sha256:600000", ...) or "bcrypt:<rounds>". Stored hashes record
+# their own method, so any mix of them verifies; a successful login moves
+# the user to the configured one.
+
+BCRYPT_MAX_BYTES = 72
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _bcrypt_password(password):
+    # bcrypt only looks at the first 72 bytes; newer releases raise
+    # instead of truncating, so truncate explicitly.
+    return password.encode()[:BCRYPT_MAX_BYTES]
+
+
+def _hash(password, method):
+    if method.startswith("bcrypt"):
+        import bcrypt
+
+        rounds = int(method.partition(":")[2] or 12)
+        return bcrypt.hashpw(_bcrypt_password(password), bcrypt.gensalt(rounds)).decode()
+    return generate_password_hash(password, method=method)
+
+
+def _verify(stored, password):
+    if stored.startswith("$2"):
+        import bcrypt
+
+        return bcrypt.checkpw(_bcrypt_password(password), stored.encode())
+    return check_password_hash(stored, password)
+
+
+def hash_method(stored):
+    """The method string a stored hash was produced with."""
+    if stored.startswith("$2"):
+        return f"bcrypt:{int(stored.split('$')[2])}"
+    return stored.split("$", 1)[0]
+
+
+@lru_cache(maxsize=16)
+def _canonical(method):
+    # "pbkdf2" or "scrypt" alone expand to Werkzeug's current defaults;
+    # hashing once tells us to what, so shorthand config does not make
+    # every login look outdated.
+    return hash_method(_hash("", method))
+
+
+def _run(function, *args):
+    # Hashing is offloaded to a small per-process pool. The hash functions
+    # release the GIL, but without a bound a burst of logins would occupy
+    # every core of the worker; with PASSWORD_HASH_WORKERS threads the
+    # other request threads keep the rest of the CPU for catalog traffic.
+    global _executor, _executor_pid
+    workers = current_app.config["PASSWORD_HASH_WORKERS"]
+    if workers <= 0:
+        return function(*args)
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+            _executor_pid = os.getpid()
+    return _executor.submit(function, *args).result()
+
+
+def hash_password(password, method=None):
+    return _run(_hash, password, method or current_app.config["PASSWORD_HASH_METHOD"])
+
+
+def needs_rehash(stored):
+    return hash_method(stored) != _canonical(current_app.config["PASSWORD_HASH_METHOD"])
+
+
+def check_password(user, password):
+    """Verify `password` for `user`.
+
+    On success, a hash made with anything but the configured method (older
+    or stronger parameters, another algorithm) is replaced with a fresh
+    one. The caller commits.
+    """
+    if not _run(_verify, user.password_hash, password):
+        return False
+    if needs_rehash(user.password_hash):
+        user.password_hash = hash_password(password)
+    return True
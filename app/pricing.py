@@ -0,0 +1,136 @@
+from dataclasses import dataclass
+
+from sqlalchemy import select
+
+from . import db
+from .cache import MISSING, LRUCache
+from .catalog import catalog_cache
+from .models import Product
+
+
+# All amounts are integer grosze (1/100 zł); floats only appear at the
+# edges (Product.price, Order.total) and are converted once.
+DELIVERY_FEES = {"kurier": 1400}
+
+
+def to_grosze(amount):
+    return int(round(amount * 100))
+
+
+def format_grosze(amount):
+    sign = "-" if amount < 0 else ""
+    zloty, grosze = divmod(abs(int(amount)), 100)
+    return f"{sign}{zloty}.{grosze:02d}"
+
+
+@dataclass(frozen=True, slots=True)
+class QuoteLine:
+    product: object
+    quantity: int
+    unit_price: int
+    subtotal: int
+
+
+@dataclass(frozen=True, slots=True)
+class Quote:
+    lines: tuple
+    items_total: int
+    delivery_method: str
+    delivery_fee: int
+    total: int
+
+    def __bool__(self):
+        return bool(self.lines)
+
+
+class PriceChanged(Exception):
+    def __init__(self, product_ids):
+        super().__init__(f"prices changed for products {sorted(product_ids)}")
+        self.product_ids = product_ids
+
+
+class PriceTable:
+    # Product id -> (unit price in grosze, snapshot), valid for one catalog
+    # generation. Any admin write bumps the generation, which swaps in an
+    # empty table on the next lookup. The generation and its table are
+    # published as one tuple, so a thread never fills or reads a table
+    # that belongs to another generation.
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self._current = (None, LRUCache(maxsize))
+
+    def lookup(self, product_ids):
+        generation = catalog_cache.generation()
+        table_generation, prices = self._current
+        if table_generation != generation:
+            prices = LRUCache(self.maxsize)
+            self._current = (generation, prices)
+
+        found, missing = {}, []
+        for pid in product_ids:
+            entry = prices.get(pid)
+            if entry is MISSING:
+                missing.append(pid)
+            else:
+                found[pid] = entry
+        if missing:
+            for pid, product in catalog_cache.get_products(missing).items():
+                found[pid] = (to_grosze(product.price), product)
+                prices.set(pid, found[pid])
+        return found
+
+
+price_table = PriceTable()
+
+
+def check_current(quote):
+    """Compare the quoted unit prices with the product rows.
+
+    Quotes come from the catalog cache, which may lag behind an edit made
+    in another process, so orders call this inside their write
+    transaction before anything is charged. Raises PriceChanged for
+    products whose price changed or that are gone; cache entries older
+    than the row are dropped either way, so the next quote is current.
+    """
+    product_ids = [line.product.id for line in quote.lines]
+    rows = {
+        product_id: (price, version)
+        for product_id, price, version in db.session.execute(
+            select(Product.id, Product.price, Product.version).where(Product.id.in_(product_ids))
+        )
+    }
+    outdated, changed = [], []
+    for line in quote.lines:
+        price, version = rows.get(line.product.id, (None, None))
+        if version != line.product.version:
+            outdated.append(line.product.id)
+        if price is None or to_grosze(price) != line.unit_price:
+            changed.append(line.product.id)
+    if outdated:
+        catalog_cache.invalidate_products(outdated)
+    if changed:
+        raise PriceChanged(changed)
+
+
+def quote(cart, delivery_method=None, table=None):
+    prices = (table or price_table).lookup(cart)
+    lines = []
+    items_total = 0
+    for product_id, quantity in cart.items():
+        entry = prices.get(product_id)
+        if entry is None or quantity <= 0:
+            continue
+        unit_price, product = entry
+        subtotal = unit_price * quantity
+        items_total += subtotal
+        lines.append(QuoteLine(product, quantity, unit_price, subtotal))
+
+    delivery_fee = DELIVERY_FEES.get(delivery_method, 0) if lines else 0
+    return Quote(
+        lines=tuple(lines),
+        items_total=items_total,
+        delivery_method=delivery_method,
+        delivery_fee=delivery_fee,
+        total=items_total + delivery_fee,
+    )
@@ -0,0 +1,251 @@
+import csv
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+from urllib.request import urlopen
+
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from werkzeug.datastructures import MultiDict
+
+from . import db, images, search
+from .catalog import catalog_cache
+from .fragments import fragment_cache
+from .models import Product
+
+
+# Columns read from every row, validated by ProductForm. `sku` is the
+# upsert key (rows without one are always inserted) and `image_url` is
+# either stored as-is, if it is an absolute http(s) URL or an existing
+# upload, or, with an image root/fetching enabled, a file path or http(s)
+# URL fed through the upload pipeline.
+FORM_FIELDS = ("name", "price", "category", "description", "properties", "preparation")
+SKU_LENGTH = 64
+MAX_IMAGE_BYTES = 20 * 1024 * 1024
+MAX_REPORTED_ERRORS = 50
+
+
+@dataclass(slots=True)
+class ImportResult:
+    read: int = 0
+    inserted: int = 0
+    updated: int = 0
+    rejected: int = 0
+    images: int = 0
+    elapsed: float = 0.0
+    errors: list = field(default_factory=list)
+
+    @property
+    def rows_per_second(self):
+        return self.read / self.elapsed if self.elapsed else 0.0
+
+    def error(self, line, message):
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+
+def read_rows(stream, fmt):
+    # Yields (line number, row dict or None) without holding the file in
+    # memory; None marks a JSONL line that is not a JSON object.
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield number, row if isinstance(row, dict) else None
+
+
+class RowValidator:
+    """Applies ProductForm's validators to plain dict rows."""
+
+    def __init__(self):
+        from wtforms import Form
+
+        from .forms import ProductForm
+
+        # A plain (non-Flask, CSRF-free) form carrying ProductForm's own
+        # field definitions. One instance is re-processed for every row;
+        # building a form per row would cost more than the insert itself.
+        RowForm = type("RowForm", (Form,), {name: getattr(ProductForm, name) for name in FORM_FIELDS})
+        self.form = RowForm()
+
+    def __call__(self, row):
+        if row is None:
+            return None, "nieprawidłowy wiersz JSON"
+        self.form.process(MultiDict({
+            name: str(row[name]) for name in FORM_FIELDS if row.get(name) not in (None, "")
+        }))
+        if not self.form.validate():
+            return None, "; ".join(
+                f"{name}: {', '.join(messages)}"
+                for name, messages in self.form.errors.items()
+            )
+
+        sku = str(row.get("sku") or "").strip() or None
+        if sku is not None and len(sku) > SKU_LENGTH:
+            return None, f"sku: maksymalnie {SKU_LENGTH} znaków"
+        values = {name: self.form[name].data for name in FORM_FIELDS}
+        values["sku"] = sku
+        values["image_url"] = str(row.get("image_url") or "").strip() or None
+        values["image_key"] = values["image_widths"] = None
+        return values, None
+
+
+def _read_image(source, image_root):
+    if source.startswith(("http://", "https://")):
+        with urlopen(source, timeout=30) as response:
+            data = response.read(MAX_IMAGE_BYTES + 1)
+    else:
+        with open(os.path.join(image_root, source), "rb") as f:
+            data = f.read(MAX_IMAGE_BYTES + 1)
+    if len(data) > MAX_IMAGE_BYTES:
+        raise images.InvalidImage("file too large")
+    return data
+
+
+def _usable_image_url(url):
+    # What a browser can load as given: an absolute http(s) URL or a file
+    # the upload pipeline has already stored.
+    parts = urlsplit(url)
+    if parts.scheme in ("http", "https") and parts.netloc:
+        return True
+    uploads = images.image_url("")
+    name = url[len(uploads):]
+    return (
+        url.startswith(uploads)
+        and name == os.path.basename(name)
+        and os.path.isfile(os.path.join(images.images_dir(), name))
+    )
+
+
+def _process_image(app, source, image_root):
+    # Runs on an executor thread, hence the explicit app context.
+    with app.app_context():
+        try:
+            return images.save_image(_read_image(source, image_root)), None
+        except (OSError, ValueError) as exc:
+            return None, f"zdjęcie {source}: {exc}"
+
+
+def _upsert_statement():
+    stmt = insert(Product.__table__)
+    updated = {name: stmt.excluded[name] for name in FORM_FIELDS}
+    # A row without an image keeps the product's current one.
+    for name in ("image_url", "image_key", "image_widths"):
+        updated[name] = db.func.coalesce(stmt.excluded[name], getattr(Product, name))
+    updated["updated_at"] = db.func.now()
+    updated["version"] = Product.version + 1
+    return stmt.on_conflict_do_update(
+        index_elements=[Product.sku], set_=updated
+    ).returning(Product.id, Product.sku, Product.name, Product.description, Product.properties)
+
+
+class ProductImporter:
+    """Streams validated rows into the product table in batches.
+
+    Each batch is one transaction: a multi-row INSERT ... ON CONFLICT(sku)
+    DO UPDATE, the matching search index rows and a cache invalidation.
+    """
+
+    def __init__(self, batch_size=1000, image_root=None, image_workers=4):
+        self.batch_size = batch_size
+        self.image_root = image_root
+        self.image_workers = image_workers
+        self.validate = RowValidator()
+        self.statement = _upsert_statement()
+        self.result = ImportResult()
+
+    def run(self, rows):
+        started = time.perf_counter()
+        executor = None
+        if self.image_root is not None:
+            executor = ThreadPoolExecutor(max_workers=self.image_workers)
+        try:
+            batch = {}
+            anonymous = []
+            for line, row in rows:
+                self.result.read += 1
+                values, error = self.validate(row)
+                if error:
+                    self.result.rejected += 1
+                    self.result.error(line, error)
+                    continue
+                if values["sku"] is None:
+                    anonymous.append((line, values))
+                else:
+                    # A repeated sku within one batch: the last row wins.
+                    batch[values["sku"]] = (line, values)
+                if len(batch) + len(anonymous) >= self.batch_size:
+                    self._flush(list(batch.values()) + anonymous, executor)
+                    batch, anonymous = {}, []
+            if batch or anonymous:
+                self._flush(list(batch.values()) + anonymous, executor)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            self.result.elapsed = time.perf_counter() - started
+        return self.result
+
+    def _attach_images(self, batch, executor):
+        app = current_app._get_current_object()
+        pending = [
+            (line, values, executor.submit(_process_image, app, values["image_url"], self.image_root))
+            for line, values in batch
+            if values["image_url"]
+        ]
+        for line, values, future in pending:
+            saved, error = future.result()
+            if error:
+                self.result.error(line, error)
+                values["image_url"] = None
+                continue
+            values["image_url"], values["image_key"], values["image_widths"] = saved
+            self.result.images += 1
+
+    def _check_image_urls(self, batch):
+        # Without --images the value is stored and served as it is.
+        for line, values in batch:
+            if values["image_url"] and not _usable_image_url(values["image_url"]):
+                self.result.error(
+                    line,
+                    f"image_url: {values['image_url']} nie jest adresem http(s) ani zapisanym "
+                    "zdjęciem (pliki wczytuje --images)",
+                )
+                values["image_url"] = None
+
+    def _flush(self, batch, executor):
+        if executor is not None:
+            self._attach_images(batch, executor)
+        else:
+            self._check_image_urls(batch)
+
+        skus = [values["sku"] for _, values in batch if values["sku"] is not None]
+        existing = set()
+        if skus:
+            existing = set(db.session.scalars(select(Product.sku).where(Product.sku.in_(skus))))
+
+        products = db.session.execute(self.statement, [values for _, values in batch]).all()
+        search.index_products(products)
+        db.session.commit()
+
+        updated = [product.id for product in products if product.sku in existing]
+        self.result.updated += len(updated)
+        self.result.inserted += len(batch) - len(updated)
+        catalog_cache.invalidate_products(updated)
+        fragment_cache.invalidate_products(updated)
+
+
+def import_products(stream, fmt, **options):
+    return ProductImporter(**options).run(read_rows(stream, fmt))
@@ -1,33 +1,90 @@
-from flask import Blueprint, render_template, redirect, url_for, request, flash, session
-from .models import Product, User, db, Order, OrderItem
-from .forms import ProductForm, LoginForm, RegisterForm, GuestCheckoutForm
-import os
-from werkzeug.utils import secure_filename
-from flask import current_app
+from flask import Blueprint, Response, render_template, redirect, url_for, request, flash, session, abort, jsonify, stream_with_context
+from .models import Product, User, db
+import secrets
+from datetime import date
+from . import analytics, carts, catalog, http_cache, images, inventory, jobs, order_export, pricing, search as product_search, orders as order_service
+from .catalog import catalog_cache
+from .database import replica_reads
+from .fragments import fragment_cache
 
 bp = Blueprint("main", __name__)
 
+
+@bp.app_context_processor
+def inject_cart():
+    return {"cart": carts.load()}
+
+
 @bp.route("/")
+@replica_reads
 def index():
     category = request.args.get("category", "all") 
-    
-    if category == "all":
-        products = Product.query.all()
-    else:
-        products = Product.query.filter_by(category=category).all()
+    sort = request.args.get("sort", catalog.DEFAULT_SORT)
+    if sort not in catalog.SORTS:
+        sort = catalog.DEFAULT_SORT
+
+    products = catalog.cached_products(
+        category=category,
+        sort=sort,
+        after=request.args.get("after"),
+        before=request.args.get("before"),
+        per_page=request.args.get("per_page"),
+    )
+
+    return http_cache.conditional(
+        lambda: render_template(
+            "index.html",
+            products = products,
+            selected_category = category,
+            selected_sort = sort,
+            sorts = catalog.SORTS
+        ),
+        validators=[(p.id, p.version) for p in products.items],
+        last_modified=max((p.updated_at for p in products.items), default=None),
+        check_modified_since=False,
+    )
+
+@bp.route("/search")
+@replica_reads
+def search():
+    query = request.args.get("q", "").strip()
+    per_page = catalog.page_size()
+    try:
+        page = max(1, int(request.args.get("page", 1)))
+    except ValueError:
+        page = 1
+
+    ids = product_search.search_ids(query, limit=per_page + 1, offset=(page - 1) * per_page)
+    has_next = len(ids) > per_page
+    found = catalog_cache.get_products(ids[:per_page])
+    products = [found[pid] for pid in ids[:per_page] if pid in found]
 
-    cart = session.get("cart", {})
     return render_template(
-        "index.html",
-        products = products,
-        cart = cart,
-        selected_category = category
+        "search.html",
+        products=products,
+        query=query,
+        page=page,
+        has_next=has_next
     )
 
 @bp.route("/product/<int:product_id>")
+@replica_reads
 def product_detail(product_id):
-    product = Product.query.get_or_404(product_id)
-    return render_template("product_detail.html", product=product)
+    product = catalog_cache.get_product(product_id)
+    if product is None:
+        abort(404)
+    return http_cache.conditional(
+        lambda: render_template("product_detail.html", product=product),
+        validators=(product.id, product.version),
+        last_modified=product.updated_at,
+    )
+
+
+@bp.route("/cache/stats")
+def cache_stats():
+    if session.get("role") != "admin":
+        abort(403)
+    return jsonify(dict(catalog_cache.stats(), fragments=fragment_cache.stats()))
 
 
 
@@ -37,24 +94,24 @@ def add_product():
         flash("Nie masz uprawnień do dodawania produktów!", "danger")
         return redirect(url_for("main.index"))
 
+    from .forms import ProductForm
+
     form = ProductForm()
     if form.validate_on_submit():
-        filename = None
+        image_url = image_key = image_widths = None
         if form.image.data:
-            filename = secure_filename(form.image.data.filename)
-            images_dir = os.path.join(current_app.root_path, "static", "images")
-            os.makedirs(images_dir, exist_ok=True)
-            upload_path = os.path.join(images_dir, filename)
-            form.image.data.save(upload_path)
-            image_url = f"/static/images/{filename}"
-        else:
-            image_url = None
-
+            try:
+                image_url, image_key, image_widths = images.save_upload(form.image.data)
+            except images.InvalidImage:
+                flash("Nie udało się odczytać zdjęcia.", "danger")
+                return render_template("add_product.html", form=form)
 
         new_product = Product(
             name=form.name.data,
             price=form.price.data,
             image_url=image_url,
+            image_key=image_key,
+            image_widths=image_widths,
             category=form.category.data,
             description=form.description.data,
             properties=form.properties.data,
@@ -62,7 +119,12 @@ def add_product():
         )
 
         db.session.add(new_product)
+        db.session.flush()
+        if form.stock.data is not None:
+            inventory.set_stock(new_product.id, form.stock.data)
+        product_search.index_product(new_product)
         db.session.commit()
+        catalog_cache.invalidate_listings()
         flash("Produkt dodany!", "success")
         return redirect(url_for("main.index"))
 
@@ -75,8 +137,12 @@ def edit_product(product_id):
         flash("Brak uprawnień!", "danger")
         return redirect(url_for("main.index"))
 
+    from .forms import ProductForm
+
     product = Product.query.get_or_404(product_id)
     form = ProductForm(obj=product)
+    if request.method == "GET":
+        form.stock.data = inventory.levels([product_id]).get(product_id)
 
     if form.validate_on_submit():
         product.name = form.name.data
@@ -87,14 +153,21 @@ def edit_product(product_id):
         product.preparation = form.preparation.data
 
         if form.image.data:
-            filename = secure_filename(form.image.data.filename)
-            images_dir = os.path.join(current_app.root_path, "static", "images")
-            os.makedirs(images_dir, exist_ok=True)
-            upload_path = os.path.join(images_dir, filename)
-            form.image.data.save(upload_path)
-            product.image_url = f"/static/images/{filename}"
-
+            try:
+                product.image_url, product.image_key, product.image_widths = (
+                    images.save_upload(form.image.data)
+                )
+            except images.InvalidImage:
+                db.session.rollback()
+                flash("Nie udało się odczytać zdjęcia.", "danger")
+                return render_template("add_product.html", form=form, edit=True)
+
+        # Sets what is available now; units held by carts come on top.
+        inventory.set_stock(product.id, form.stock.data)
+        product_search.index_product(product)
         db.session.commit()
+        catalog_cache.invalidate_product(product.id)
+        fragment_cache.invalidate_product(product.id)
         flash("Produkt zaktualizowany!", "success")
         return redirect(url_for("main.product_detail", product_id=product.id))
 
@@ -108,13 +181,19 @@ def delete_product(product_id):
 
     product = Product.query.get_or_404(product_id)
     db.session.delete(product)
+    inventory.set_stock(product_id, None)
+    product_search.remove_product(product_id)
     db.session.commit()
+    catalog_cache.invalidate_product(product_id)
+    fragment_cache.invalidate_product(product_id)
     flash("Produkt usunięty!", "info")
     return redirect(url_for("main.index"))
 
 
 @bp.route("/register", methods=["GET", "POST"])
 def register():
+    from .forms import RegisterForm
+
     form = RegisterForm()
     if form.validate_on_submit():
         if User.query.filter_by(username=form.username.data).first():
@@ -150,6 +229,8 @@ def register():
 
 @bp.route("/login", methods=["GET", "POST"])
 def login():
+    from .forms import LoginForm
+
     form = LoginForm()
     if form.validate_on_submit():
         user = User.query.filter_by(username=form.username.data).first()
@@ -157,6 +238,8 @@ def login():
             session["user_id"] = user.id
             session["username"] = user.username
             session["role"] = user.role
+            db.session.commit()  # keeps a password hash upgraded by check_password
+            carts.merge_on_login(user.id)
             flash(f"Zalogowano jako {user.username}", "success")
             return redirect(url_for("main.index"))
         else:
@@ -173,124 +256,151 @@ def logout():
 
 @bp.route("/add_to_cart/<int:product_id>", methods=["POST"])
 def add_to_cart(product_id):
-    cart = session.get("cart", {})
-    pid = str(product_id)  
-    cart[pid] = cart.get(pid, 0) + 1
-    session["cart"] = cart
+    if catalog_cache.get_product(product_id) is None:
+        abort(404)
+    if not carts.add(product_id):
+        flash("Produkt chwilowo niedostępny.", "warning")
     return redirect(request.referrer or url_for("main.index"))
 
 
 @bp.route("/update_cart/<int:product_id>", methods=["POST"])
 def update_cart(product_id):
     action = request.form.get("action")
-    cart = session.get("cart", {})
-    pid = str(product_id) 
-    if pid in cart:
-        if action == "increase":
-            cart[pid] += 1
-        elif action == "decrease":
-            cart[pid] -= 1
-            if cart[pid] <= 0:
-                del cart[pid]
-    session["cart"] = cart
+    if action == "increase":
+        if not carts.change(product_id, 1) and product_id in carts.load():
+            flash("Brak większej ilości tego produktu w magazynie.", "warning")
+    elif action == "decrease":
+        carts.change(product_id, -1)
     return redirect(request.referrer or url_for("main.index"))
 
 
 @bp.route("/cart")
 def cart():
-    cart = session.get("cart", {})
+    cart = carts.load()
     if not cart:
         flash("Koszyk jest pusty.", "info")
-        return render_template("cart.html", products=[], total=0)
-
-    product_ids = [int(pid) for pid in cart.keys()]
-    products = Product.query.filter(Product.id.in_(product_ids)).all()
+        return render_template("cart.html", quote=None)
 
-    items = []
-    total = 0
-    for product in products:
-        qty = cart.get(str(product.id), 0)
-        subtotal = qty * product.price
-        total += subtotal
-        items.append({
-            "product": product,
-            "qty": qty,
-            "subtotal": subtotal
-        })
-
-    return render_template("cart.html", products=items, total=total)
+    quote = pricing.quote(cart)
+    return render_template("cart.html", quote=quote)
 
 
 @bp.route("/remove_from_cart/<int:product_id>", methods=["POST"])
 def remove_from_cart(product_id):
-    cart = session.get("cart", {})
-    pid = str(product_id)
-    if pid in cart:
-        del cart[pid]
-        session["cart"] = cart
+    if carts.remove(product_id):
         flash("Produkt usunięty z koszyka.", "info")
     return redirect(request.referrer or url_for("main.cart"))
 
 
 @bp.route("/clear_cart", methods=["POST"])
 def clear_cart():
-    session["cart"] = {}
+    carts.clear()
     flash("Koszyk został opróżniony.", "info")
     return redirect(url_for("main.cart"))
 
+def _out_of_stock(quote, exc):
+    names = ", ".join(line.product.name for line in quote.lines if line.product.id in exc.product_ids)
+    flash(f"Niewystarczająca ilość w magazynie: {names}. Zmień ilość w koszyku.", "danger")
+    return redirect(url_for("main.cart"))
+
+
+def _price_changed(quote, exc, endpoint):
+    # The cache the quote came from had not seen an edit yet; the page we
+    # send the shopper back to quotes the current prices.
+    names = ", ".join(line.product.name for line in quote.lines if line.product.id in exc.product_ids)
+    flash(f"Zmieniła się cena produktów: {names}. Sprawdź nową kwotę i złóż zamówienie ponownie.", "warning")
+    return redirect(url_for(endpoint))
+
+
 @bp.route("/place_order", methods=["POST"])
 def place_order():
     if "user_id" not in session:
         flash("Musisz być zalogowany, aby złożyć zamówienie.", "danger")
         return redirect(url_for("main.login"))
 
-    cart = session.get("cart", {})
-    if not cart:
+    idempotency_key = request.form.get("idempotency_key")
+    if order_service.find_by_idempotency_key(idempotency_key):
+        return redirect(url_for("main.orders"))
+
+    quote = pricing.quote(carts.load())
+    if not quote:
         flash("Koszyk jest pusty.", "warning")
         return redirect(url_for("main.cart"))
 
-    user_id = session["user_id"]
-
-    product_ids = [int(pid) for pid in cart.keys()]
-    products = Product.query.filter(Product.id.in_(product_ids)).all()
-
-    total = 0
-    order = Order(user_id=user_id, total=0)
-    db.session.add(order)
-    db.session.flush()  
-
-    for product in products:
-        qty = cart[str(product.id)]
-        subtotal = qty * product.price
-        total += subtotal
-        item = OrderItem(
-            order_id=order.id,
-            product_id=product.id,
-            quantity=qty,
-            price=product.price
+    try:
+        order_service.create_order(
+            quote,
+            idempotency_key=idempotency_key,
+            before_commit=lambda order: carts.clear(commit=False),
+            cart_id=carts.cart_id(),
+            user_id=session["user_id"],
         )
-        db.session.add(item)
-
-    order.total = total
-    db.session.commit()
-
-    session["cart"] = {}
+    except inventory.OutOfStock as exc:
+        return _out_of_stock(quote, exc)
+    except pricing.PriceChanged as exc:
+        return _price_changed(quote, exc, "main.cart")
 
     flash("Zamówienie zostało złożone!", "success")
-    return redirect(url_for("main.my_orders"))
+    return redirect(url_for("main.orders"))
 
 @bp.route("/orders")
+@replica_reads
 def orders():
     if "user_id" not in session:
         flash("Zaloguj się, aby zobaczyć zamówienia.", "danger")
         return redirect(url_for("main.login"))
 
-    if session.get("role") == "admin":
-        orders = Order.query.order_by(Order.created_at.desc()).all()
-    else:
-        orders = Order.query.filter_by(user_id=session["user_id"]).order_by(Order.created_at.desc()).all()
+    filters = order_service.parse_filters(request.args)
+    orders = order_service.list_orders(
+        filters,
+        user_id=None if session.get("role") == "admin" else session["user_id"],
+        after=request.args.get("after"),
+        before=request.args.get("before"),
+    )
 
-    return render_template("orders.html", orders=orders)
+    return render_template(
+        "orders.html",
+        orders=orders,
+        filters=request.args,
+        statuses=order_service.ORDER_STATUSES
+    )
+
+@bp.route("/orders/export.<fmt>")
+@replica_reads
+def export_orders(fmt):
+    if session.get("role") != "admin":
+        abort(403)
+    if fmt not in order_export.FORMATS:
+        abort(404)
+
+    # Streamed straight from the database cursor: nothing is buffered, so
+    # the response starts at once and memory does not grow with the range.
+    filters = order_service.parse_filters(request.args)
+    return Response(
+        stream_with_context(order_export.iter_export(fmt, filters)),
+        mimetype=order_export.FORMATS[fmt],
+        headers={"Content-Disposition": f"attachment; filename=zamowienia-{date.today():%Y%m%d}.{fmt}"},
+    )
+
+@bp.route("/sales")
+@replica_reads
+def sales():
+    if session.get("role") != "admin":
+        flash("Nie masz uprawnień do podglądu sprzedaży.", "danger")
+        return redirect(url_for("main.index"))
+
+    days = request.args.get("days", 30, type=int)
+    if days not in analytics.DASHBOARD_PERIODS:
+        days = 30
+    report = analytics.dashboard(days)
+    products = catalog_cache.get_products([int(row.key) for row in report["top_products"]])
+    return render_template(
+        "sales.html",
+        report=report,
+        days=days,
+        periods=analytics.DASHBOARD_PERIODS,
+        products=products,
+    )
 
 @bp.route("/users")
 def users():
@@ -320,7 +430,8 @@ def delete_user(user_id):
 
 @bp.route("/checkout/delivery", methods=["GET", "POST"])
 def checkout_delivery():
-    
+    from .forms import GuestCheckoutForm
+
     guest_form = GuestCheckoutForm()
 
     if not session.get("user_id"):
@@ -353,69 +464,68 @@ def checkout_delivery():
 
 @bp.route("/checkout/summary", methods=["GET", "POST"])
 def checkout_summary():
-    cart = session.get("cart", {})
-    if not cart:
+    if request.method == "POST":
+        # A double click or a retried POST carries the same key as the
+        # first submission: show that order instead of creating another.
+        existing = order_service.find_by_idempotency_key(request.form.get("idempotency_key"))
+        if existing is not None:
+            return redirect(url_for("main.order_detail", order_id=existing.id))
+
+    quote = pricing.quote(carts.load(), session.get("checkout_delivery"))
+    if not quote:
         flash("Koszyk jest pusty.", "warning")
         return redirect(url_for("main.cart"))
 
-    product_ids = [int(pid) for pid in cart.keys()]
-    products = Product.query.filter(Product.id.in_(product_ids)).all()
-
-    items = []
-    total = 0
-    for p in products:
-        qty = cart[str(p.id)]
-        subtotal = qty * p.price
-        items.append({"product": p, "qty": qty, "subtotal": subtotal})
-        total += subtotal
-
-    if session.get("checkout_delivery") == "kurier":
-        total += 14
-
     if request.method == "POST":
         blik_code = request.form.get("blik_code")
-        order = Order(
-            user_id=session.get("user_id"),
-            total=total,
-            delivery_method=session.get("checkout_delivery"),
-            payment_method=session.get("checkout_payment"),
-            status="Zapłacone - w realizacji" if blik_code else (
-                "w realizacji" if session.get("checkout_payment") == "odbior" else "oczekuje na płatność"
-            ),
-        )
-
         address = session.get("checkout_address", {})
-        order.first_name = address.get("first_name")
-        order.last_name = address.get("last_name")
-        order.email = address.get("email")
-        order.street = address.get("street")
-        order.house_number = address.get("house_number")
-        order.postal_code = address.get("postal_code")
-        order.city = address.get("city")
-
-        db.session.add(order)
-        db.session.flush()
 
-        for item in items:
-            db.session.add(OrderItem(
-                order_id=order.id,
-                product_id=item["product"].id,
-                quantity=item["qty"],
-                price=item["product"].price
-            ))
+        def before_commit(order):
+            carts.clear(commit=False)
+            if blik_code:
+                # The payment is confirmed in the background; the order
+                # page shows it awaiting payment until then.
+                jobs.enqueue("orders.confirm_blik", order_id=order.id)
+
+        try:
+            order, _ = order_service.create_order(
+                quote,
+                idempotency_key=request.form.get("idempotency_key"),
+                before_commit=before_commit,
+                cart_id=carts.cart_id(),
+                user_id=session.get("user_id"),
+                delivery_method=session.get("checkout_delivery"),
+                payment_method=session.get("checkout_payment"),
+                status="w realizacji" if session.get("checkout_payment") == "odbior" else order_service.AWAITING_PAYMENT,
+                first_name=address.get("first_name"),
+                last_name=address.get("last_name"),
+                email=address.get("email"),
+                street=address.get("street"),
+                house_number=address.get("house_number"),
+                postal_code=address.get("postal_code"),
+                city=address.get("city"),
+            )
+        except inventory.OutOfStock as exc:
+            return _out_of_stock(quote, exc)
+        except pricing.PriceChanged as exc:
+            return _price_changed(quote, exc, "main.checkout_summary")
 
-        db.session.commit()
-        session["cart"] = {}
         session.pop("checkout_address", None)
         session.pop("checkout_delivery", None)
         session.pop("checkout_payment", None)
 
         return redirect(url_for("main.order_detail", order_id=order.id))
 
-    return render_template("checkout/summary.html", items=items, total=total)
+    return render_template(
+        "checkout/summary.html",
+        quote=quote,
+        idempotency_key=secrets.token_urlsafe(24)
+    )
 
 
 @bp.route("/order/<int:order_id>")
 def order_detail(order_id):
-    order = Order.query.get_or_404(order_id)
+    order = order_service.get_order_with_items(order_id)
+    if order is None:
+        abort(404)
     return render_template("checkout/confirm.html", order=order)
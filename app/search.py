@@ -0,0 +1,119 @@
+import json
+import re
+import unicodedata
+
+from sqlalchemy import Integer, select, text
+
+from . import db
+
+
+TABLE = "product_search"
+COLUMNS = ("name", "description", "properties")
+# bm25 weights per column: a hit in the name counts most.
+WEIGHTS = (10.0, 1.0, 3.0)
+
+# "ł" has no Unicode decomposition, so NFKD alone would keep it.
+_FOLD = str.maketrans({"ł": "l", "Ł": "L", "đ": "d", "Đ": "D"})
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def fold(value):
+    if not value:
+        return ""
+    if value.isascii():
+        return value.lower()
+    value = unicodedata.normalize("NFKD", value.translate(_FOLD))
+    return "".join(ch for ch in value if not unicodedata.combining(ch)).lower()
+
+
+def ensure_index():
+    db.session.execute(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+        f"{', '.join(COLUMNS)}, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    ))
+
+
+def _row(product):
+    return {
+        "rowid": product.id,
+        "name": fold(product.name),
+        "description": fold(product.description),
+        "properties": fold(product.properties),
+    }
+
+
+_INSERT = text(
+    f"INSERT INTO {TABLE} (rowid, {', '.join(COLUMNS)}) "
+    f"VALUES (:rowid, {', '.join(':' + c for c in COLUMNS)})"
+)
+
+
+def index_product(product):
+    remove_product(product.id)
+    db.session.execute(_INSERT, _row(product))
+
+
+def index_products(products):
+    # Bulk variant of index_product() for imports: one DELETE and one
+    # executemany INSERT for the whole batch.
+    rows = [_row(product) for product in products]
+    if not rows:
+        return
+    db.session.execute(
+        text(f"DELETE FROM {TABLE} WHERE rowid IN (SELECT value FROM json_each(:ids))"),
+        {"ids": json.dumps([row["rowid"] for row in rows])},
+    )
+    db.session.execute(_INSERT, rows)
+
+
+def remove_product(product_id):
+    db.session.execute(text(f"DELETE FROM {TABLE} WHERE rowid = :id"), {"id": product_id})
+
+
+def rebuild(batch_size=2000):
+    from .models import Product
+
+    ensure_index()
+    db.session.execute(text(f"DELETE FROM {TABLE}"))
+    batch = []
+    count = 0
+    rows = db.session.execute(
+        select(Product.id, Product.name, Product.description, Product.properties)
+        .execution_options(yield_per=batch_size)
+    )
+    for product in rows:
+        batch.append(_row(product))
+        if len(batch) >= batch_size:
+            db.session.execute(_INSERT, batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(_INSERT, batch)
+        count += len(batch)
+    db.session.execute(text(f"INSERT INTO {TABLE}({TABLE}) VALUES ('optimize')"))
+    db.session.commit()
+    return count
+
+
+def match_expression(query):
+    # Every term must match, each as a prefix ("yerb mat" -> "yerba mate").
+    terms = _TOKEN.findall(fold(query))
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def search_ids(query, limit=24, offset=0):
+    expression = match_expression(query)
+    if expression is None:
+        return []
+    weights = ", ".join(str(w) for w in WEIGHTS)
+    rows = db.session.execute(
+        text(
+            f"SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH :q "
+            f"ORDER BY bm25({TABLE}, {weights}) LIMIT :limit OFFSET :offset"
+        ).columns(rowid=Integer),
+        {"q": expression, "limit": limit, "offset": offset},
+    )
+    return [row[0] for row in rows]
@@ -0,0 +1,27 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+from app import create_app, db
+from app.search import ensure_index
+
+
+@contextmanager
+def temporary_app(**config):
+    """Yield an app bound to a throwaway SQLite database."""
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = {
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(tmp, "bench.db"),
+            "WTF_CSRF_ENABLED": False,
+        }
+        settings.update(config)
+        app = create_app(settings)
+        with app.app_context():
+            db.create_all(bind_key=None)
+            ensure_index()
+            db.session.commit()
+        try:
+            yield app
+        finally:
+            with app.app_context():
+                db.engine.dispose()
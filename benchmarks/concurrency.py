@@ -0,0 +1,175 @@
+"""Show that catalog reads keep flowing while orders are being written.
+
+Lock check: one connection holds a write transaction open with the
+exclusive lock every commit takes, and a second one reads with a short
+busy_timeout. With the configured pragmas (WAL) the read must succeed at
+once and see the last committed data; with SQLite's default rollback
+journal the same read must fail with "database is locked". Exits
+non-zero otherwise; tests/test_concurrency.py runs the same check.
+
+Then, for timing only, writer threads create orders while reader threads
+page through the catalog, in both modes. With threads in one process
+the two modes come out close: writes are short and readers retry within
+busy_timeout, so this part shows latencies, not the difference.
+
+    python -m benchmarks.concurrency [--readers 4] [--writers 2] [--seconds 3]
+"""
+import argparse
+import sqlite3
+import statistics
+import sys
+import threading
+import time
+import uuid
+
+from sqlalchemy import insert, select
+
+from app import db, orders, pricing
+from app.config import Config
+from app.models import Product
+
+from .common import temporary_app
+
+
+ROLLBACK_JOURNAL = {"journal_mode": "DELETE", "synchronous": "FULL"}
+
+
+def read_during_write(pragmas, busy_timeout_ms=100):
+    """Read the catalog while another connection holds a write lock.
+
+    Returns (rows read or None, seconds the read took, error or None).
+    """
+    with temporary_app(SQLITE_PRAGMAS=pragmas) as app:
+        with app.app_context():
+            db.session.execute(insert(Product), [
+                {"name": f"Yerba {i}", "price": 10, "category": "Relax"} for i in range(100)
+            ])
+            db.session.commit()
+            writer = db.engine.raw_connection()
+            reader = db.engine.raw_connection()
+            try:
+                writer.driver_connection.execute("BEGIN EXCLUSIVE")
+                writer.driver_connection.execute("UPDATE product SET price = price + 1")
+                reader.driver_connection.execute(f"PRAGMA busy_timeout={busy_timeout_ms}")
+                started = time.perf_counter()
+                try:
+                    rows = reader.driver_connection.execute(
+                        "SELECT count(*) FROM product WHERE price = 10").fetchone()[0]
+                    error = None
+                except sqlite3.OperationalError as exc:
+                    rows, error = None, str(exc)
+                elapsed = time.perf_counter() - started
+                writer.driver_connection.rollback()
+            finally:
+                reader.close()
+                writer.close()
+    return rows, elapsed, error
+
+
+def reader(app, deadline, latencies, errors):
+    with app.app_context():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                db.session.execute(
+                    select(Product.id, Product.price)
+                    .where(Product.category == "Relax")
+                    .order_by(Product.price, Product.id)
+                    .limit(25)
+                ).all()
+                db.session.commit()
+            except Exception as exc:
+                db.session.rollback()
+                errors.append(repr(exc))
+            latencies.append(time.perf_counter() - started)
+        db.session.remove()
+
+
+def writer(app, deadline, written, errors):
+    with app.test_request_context():
+        quote = pricing.quote({1: 1, 2: 3, 3: 2})
+        while time.perf_counter() < deadline:
+            try:
+                orders.create_order(quote, idempotency_key=uuid.uuid4().hex, status="nowe")
+                written.append(1)
+            except Exception as exc:
+                db.session.rollback()
+                errors.append(repr(exc))
+        db.session.remove()
+
+
+def run(pragmas, readers, writers, seconds):
+    with temporary_app(SQLITE_PRAGMAS=pragmas) as app:
+        with app.app_context():
+            db.session.execute(insert(Product), [
+                {"name": f"Yerba {i}", "price": 10 + i % 50, "category": "Relax"}
+                for i in range(5000)
+            ])
+            db.session.commit()
+
+        latencies, read_errors, written, write_errors = [], [], [], []
+        deadline = time.perf_counter() + seconds
+        threads = [
+            threading.Thread(target=reader, args=(app, deadline, latencies, read_errors))
+            for _ in range(readers)
+        ] + [
+            threading.Thread(target=writer, args=(app, deadline, written, write_errors))
+            for _ in range(writers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    latencies.sort()
+    return {
+        "reads": len(latencies),
+        "read_p50_ms": statistics.median(latencies) * 1000,
+        "read_max_ms": latencies[-1] * 1000,
+        "read_errors": len(read_errors),
+        "writes": len(written),
+        "write_errors": len(write_errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=3)
+    args = parser.parse_args()
+
+    modes = {
+        "wal": Config.SQLITE_PRAGMAS,
+        "rollback journal": ROLLBACK_JOURNAL,
+    }
+    failed = False
+    print("read while a write transaction holds the lock (busy_timeout 100 ms):")
+    for name, pragmas in modes.items():
+        rows, elapsed, error = read_during_write(pragmas)
+        # WAL: the reader gets the committed snapshot (all 100 rows still at
+        # the old price). Rollback journal: the reader is locked out.
+        ok = rows == 100 if name == "wal" else error is not None and "locked" in error
+        failed |= not ok
+        print(f"  {name:<17} {'read ' + str(rows) + ' rows' if error is None else error} "
+              f"in {elapsed * 1000:.1f} ms{'' if ok else '  FAILED'}")
+
+    print("threads, timing only:")
+    results = {}
+    for name, pragmas in modes.items():
+        results[name] = result = run(pragmas, args.readers, args.writers, args.seconds)
+        print(f"  {name:<17} reads={result['reads']:<7} p50={result['read_p50_ms']:.2f}ms "
+              f"max={result['read_max_ms']:.1f}ms read_errors={result['read_errors']} "
+              f"writes={result['writes']} write_errors={result['write_errors']}")
+
+    wal = results["wal"]
+    if wal["read_errors"] or wal["write_errors"]:
+        print("reads or writes failed in WAL mode", file=sys.stderr)
+        failed = True
+    if failed:
+        print("WAL lock check failed", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
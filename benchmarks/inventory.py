@@ -0,0 +1,215 @@
+"""Flash sale on one product: no overselling, and checkout throughput.
+
+Direct phase: for each thread count, --stock units of one product are
+sold by threads calling create_order in a loop until it reports the
+product sold out. Every run must sell exactly --stock units, leave the
+counter at zero and fail nothing but OutOfStock. For contrast, the same
+run with a read-check-write decrement shows how many units it oversells.
+Orders per second stay flat (or drop slightly) as threads are added:
+SQLite takes one write transaction at a time, so more threads only add
+waiting for the lock.
+
+Cart phase: shoppers go through the real routes (add to cart, which
+reserves a unit, then checkout); every fourth one abandons the cart. At
+the end the sold and held units must add up to the stock, and one bulk
+expiry must return every held unit.
+
+The invariants are enforced by tests/test_inventory.py; run this script
+for the throughput numbers.
+
+    python -m benchmarks.inventory [--stock 500] [--threads 1 2 4 8] [--shoppers 8]
+"""
+import argparse
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select, update
+
+from app import db, inventory, orders, pricing
+from app.models import Order, Product, Stock, StockReservation
+
+from . import loadgen
+from .common import temporary_app
+
+# Metrics off: the slow query log would report every wait for the write
+# lock, which the throughput and checkout latencies already show.
+CONFIG = {"METRICS_ENABLED": False}
+
+
+def setup(app, stock):
+    with app.app_context():
+        db.session.execute(insert(Product), [
+            {"name": "Yerba limitowana", "price": 49.99, "category": "Relax"},
+            {"name": "Yerba zwykła", "price": 19.99, "category": "Relax"},
+        ])
+        inventory.set_stock(1, stock)
+        db.session.commit()
+
+
+def available(app):
+    with app.app_context():
+        return db.session.scalar(select(Stock.available).where(Stock.product_id == 1))
+
+
+def order_count(app):
+    with app.app_context():
+        return db.session.scalar(select(func.count()).select_from(Order))
+
+
+def naive_sell(quote):
+    # What the conditional UPDATE replaces: read the level, check it, then
+    # write the computed value. Two sellers can read the same level.
+    left = db.session.scalar(select(Stock.available).where(Stock.product_id == 1))
+    db.session.commit()
+    if left < 1:
+        raise inventory.OutOfStock([1])
+    db.session.execute(update(Stock).where(Stock.product_id == 1).values(available=left - 1))
+    orders.create_order(quote, idempotency_key=uuid.uuid4().hex, status="nowe")
+
+
+def hammer(app, threads, naive=False):
+    sold, errors = [], []
+
+    def seller():
+        with app.test_request_context():
+            quote = pricing.quote({1: 1, 2: 1})
+            while True:
+                try:
+                    if naive:
+                        naive_sell(quote)
+                    else:
+                        orders.create_order(quote, idempotency_key=uuid.uuid4().hex, status="nowe")
+                    sold.append(1)
+                except inventory.OutOfStock:
+                    break
+                except Exception as exc:
+                    db.session.rollback()
+                    errors.append(repr(exc))
+                    break
+            db.session.remove()
+
+    workers = [threading.Thread(target=seller) for _ in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return len(sold), errors, time.perf_counter() - started
+
+
+def direct(stock, threads, naive=False):
+    with temporary_app(**CONFIG) as app:
+        setup(app, stock)
+        sold, errors, elapsed = hammer(app, threads, naive)
+        return {
+            "sold": sold,
+            "orders": order_count(app),
+            "left": available(app),
+            "errors": errors,
+            "per_second": sold / elapsed,
+        }
+
+
+def shopper(app, abandon, results, latencies):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["checkout_address"] = {"first_name": "Jan", "last_name": "Kowalski", "email": "jan@example.com"}
+        session["checkout_delivery"] = "kurier"
+        session["checkout_payment"] = "odbior"
+    while True:
+        client.post("/add_to_cart/1")
+        with app.app_context():
+            held = db.session.scalar(select(func.count()).select_from(StockReservation))
+        if abandon:
+            # One unit held in a cart that never checks out.
+            results.append("held")
+            return
+        started = time.perf_counter()
+        response = client.post("/checkout/summary", data={"idempotency_key": uuid.uuid4().hex})
+        latencies.append(time.perf_counter() - started)
+        location = response.headers.get("Location", "")
+        if "/order/" in location:
+            results.append("sold")
+        elif held == 0 or "/cart" in location:
+            return
+        else:
+            results.append(f"unexpected {response.status_code} {location}")
+            return
+
+
+def carts(stock, shoppers):
+    with temporary_app(STOCK_RESERVATION_MINUTES=60, **CONFIG) as app:
+        setup(app, stock)
+        results, latencies = [], []
+        workers = [
+            threading.Thread(target=shopper, args=(app, i % 4 == 3, results, latencies))
+            for i in range(shoppers)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        sold = results.count("sold")
+        with app.app_context():
+            held = db.session.scalar(select(func.coalesce(func.sum(StockReservation.quantity), 0)))
+            left_before = available(app)
+            released = inventory.release_expired(now=datetime.utcnow() + timedelta(hours=2))
+            db.session.commit()
+        latencies.sort()
+        return {
+            "checkout_p50_ms": loadgen.percentile(latencies, 0.5) * 1000,
+            "checkout_p99_ms": loadgen.percentile(latencies, 0.99) * 1000,
+            "sold": sold,
+            "orders": order_count(app),
+            "held": held,
+            "left": left_before,
+            "released": released,
+            "left_after_expiry": available(app),
+            "unexpected": [r for r in results if r.startswith("unexpected")],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stock", type=int, default=500)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--shoppers", type=int, default=8)
+    args = parser.parse_args()
+
+    failed = False
+    print(f"direct checkouts, {args.stock} units of one product:")
+    for threads in args.threads:
+        result = direct(args.stock, threads)
+        ok = (result["sold"] == result["orders"] == args.stock and result["left"] == 0
+              and not result["errors"])
+        failed |= not ok
+        print(f"  {threads:>2} threads  {result['per_second']:>7.0f} orders/s  sold {result['sold']}  "
+              f"left {result['left']}  errors {len(result['errors'])}{'' if ok else '  FAILED'}")
+        for error in result["errors"][:3]:
+            print(f"      {error}")
+
+    threads = max(args.threads)
+    result = direct(args.stock, threads, naive=True)
+    print(f"  read-check-write, {threads} threads: sold {result['sold']} of {args.stock} "
+          f"(oversold {result['sold'] - args.stock}), errors {len(result['errors'])}")
+
+    result = carts(args.stock, args.shoppers)
+    ok = (result["sold"] == result["orders"] and result["sold"] + result["held"] == args.stock
+          and result["left"] == 0 and result["released"] == result["held"]
+          and result["left_after_expiry"] == result["held"] and not result["unexpected"])
+    failed |= not ok
+    print(f"carts, {args.shoppers} shoppers: sold {result['sold']}, held by abandoned carts {result['held']}, "
+          f"left {result['left']}; after expiry {result['left_after_expiry']}{'' if ok else '  FAILED'}")
+    print(f"  checkout p50 {result['checkout_p50_ms']:.1f} ms  p99 {result['checkout_p99_ms']:.1f} ms")
+    for error in result["unexpected"][:3]:
+        print(f"      {error}")
+
+    if failed:
+        sys.exit("inventory check failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Job queue throughput, retries and dead-lettering, fully offline.
+
+Starts the SMTP stand-in on a free port, creates --orders orders (each
+enqueues a confirmation mail, every other one a BLIK confirmation), then
+drains the queue with --threads workers and checks that every mail landed
+in the stand-in's mailbox and every BLIK order got paid. A second phase
+queues jobs that fail once and jobs that always fail, and checks that the
+first are retried to success and the second end up in dead_job.
+
+    python -m benchmarks.jobs [--orders 200] [--threads 2]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+from sqlalchemy import func, insert, select
+
+from app import db, jobs, orders, pricing
+from app.mail import MailboxServer
+from app.models import DeadJob, Job, Order, Product
+
+from .common import temporary_app
+
+FLAKY_CALLS = {}
+
+
+@jobs.handler("bench.flaky")
+def flaky(key):
+    FLAKY_CALLS[key] = FLAKY_CALLS.get(key, 0) + 1
+    if FLAKY_CALLS[key] == 1:
+        raise RuntimeError("first attempt fails")
+
+
+@jobs.handler("bench.broken")
+def broken(key):
+    raise RuntimeError("always fails")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as maildir, MailboxServer(("127.0.0.1", 0), maildir) as smtp:
+        threading.Thread(target=smtp.serve_forever, daemon=True).start()
+        config = {
+            "MAIL_PORT": smtp.server_address[1],
+            "JOBS_BACKOFF_SECONDS": 0,
+            "JOBS_MAX_ATTEMPTS": 3,
+        }
+        with temporary_app(**config) as app:
+            with app.test_request_context():
+                db.session.execute(insert(Product), [
+                    {"name": f"Yerba {i}", "price": 19.99, "category": "Relax"} for i in range(3)
+                ])
+                db.session.commit()
+                quote = pricing.quote({1: 1, 2: 2, 3: 1})
+
+                started = time.perf_counter()
+                for i in range(args.orders):
+                    blik = i % 2 == 0
+                    orders.create_order(
+                        quote,
+                        idempotency_key=uuid.uuid4().hex,
+                        before_commit=(lambda order: jobs.enqueue("orders.confirm_blik", order_id=order.id))
+                        if blik else None,
+                        status=orders.AWAITING_PAYMENT,
+                        payment_method="blik" if blik else "odbior",
+                        email=f"klient{i}@example.com",
+                    )
+                placed = time.perf_counter() - started
+                queued = db.session.scalar(select(func.count()).select_from(Job))
+
+            started = time.perf_counter()
+            processed = jobs.run_workers(app, threads=args.threads, drain=True)
+            drained = time.perf_counter() - started
+
+            with app.app_context():
+                paid = db.session.scalar(select(func.count()).where(Order.status == orders.PAID))
+                for i in range(10):
+                    jobs.enqueue("bench.flaky", key=i)
+                    jobs.enqueue("bench.broken", key=i)
+                db.session.commit()
+            retried = jobs.run_workers(app, threads=args.threads, drain=True)
+            with app.app_context():
+                remaining = db.session.scalar(select(func.count()).select_from(Job))
+                dead = db.session.scalar(select(func.count()).select_from(DeadJob))
+
+        mails = len(os.listdir(maildir))
+
+    print(f"orders: {args.orders} in {placed:.2f} s ({placed / args.orders * 1000:.2f} ms each, jobs queued: {queued})")
+    print(f"worker: {processed} jobs in {drained:.2f} s ({processed / drained:.0f} jobs/s, {args.threads} threads)")
+    print(f"mails received: {mails}, BLIK orders paid: {paid}")
+    print(f"failure phase: {retried} attempts, flaky succeeded: {sum(1 for c in FLAKY_CALLS.values() if c == 2)}, "
+          f"dead: {dead}, left in queue: {remaining}")
+
+    expected_blik = (args.orders + 1) // 2
+    if mails != args.orders or paid != expected_blik or dead != 10 or remaining:
+        sys.exit("job queue check failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""Latency, throughput and query counts of the main shop flows.
+
+Seeds a throwaway database with benchmarks.seed (or uses --database, e.g.
+one prepared with `python -m benchmarks.seed`), then:
+
+* drives the catalog, product page, search, cart, checkout and orders
+  flows, and their /api/v1 counterparts, through the Flask test client,
+  recording latency and the number of SQL statements of every request;
+* starts gunicorn (or the dev server) on the same database and replays the
+  read flows with benchmarks.loadgen from --clients threads.
+
+The result is JSON (stdout or --output) meant to be diffed across commits.
+
+    python -m benchmarks.load [--products 5000] [--orders 20000] [--iterations 200]
+    python -m benchmarks.load --database data/bench.db --output load.json
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import quote
+
+from sqlalchemy import event, func, select
+
+from app import create_app, db, search
+from app.models import Cart, CartItem, Order, OrderItem, Product, User
+
+from . import loadgen, seed, serve
+
+SEARCH_TERMS = ("mate", "mięta", "guarana", "paragwaj", "zielona herbata", "owocowa")
+
+
+def summarize(latencies, queries, errors):
+    # Test-client requests run back to back, so throughput is 1 / mean latency.
+    latencies = sorted(latencies)
+    total = sum(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / total, 1) if total else 0.0,
+        "p50_ms": round(loadgen.percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(loadgen.percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(loadgen.percentile(latencies, 0.99) * 1000, 2),
+        "queries_mean": round(sum(queries) / len(queries), 2),
+        "queries_max": max(queries),
+    }
+
+
+class Recorder:
+    """Times test-client requests and counts their SQL statements."""
+
+    def __init__(self, engine):
+        self.statements = 0
+        self.results = {}
+        event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.statements += 1
+
+    def request(self, name, client, method, url, expected, **kwargs):
+        self.statements = 0
+        started = time.perf_counter()
+        response = client.open(url, method=method, **kwargs)
+        elapsed = time.perf_counter() - started
+        latencies, queries, errors = self.results.setdefault(name, ([], [], [0]))
+        latencies.append(elapsed)
+        queries.append(self.statements)
+        if response.status_code != expected:
+            errors[0] += 1
+        return response
+
+    def summary(self):
+        return {
+            name: summarize(latencies, queries, errors[0])
+            for name, (latencies, queries, errors) in self.results.items()
+        }
+
+
+def login(client, user_id, role="user"):
+    with client.session_transaction() as session:
+        session["user_id"] = user_id
+        session["role"] = role
+
+
+def run_client_flows(app, engine, iterations, rng, product_ids, user_ids):
+    recorder = Recorder(engine)
+    browser = app.test_client()
+    admin = app.test_client()
+    login(admin, user_ids[0], "admin")
+
+    for user_id in user_ids[1:iterations + 1]:
+        recorder.request("index", browser, "GET", rng.choice(
+            ["/", "/?sort=price_asc", "/?sort=price_desc", "/?category=Relax"]), 200)
+        recorder.request("product_detail", browser, "GET",
+                         f"/product/{rng.choice(product_ids)}", 200)
+        recorder.request("search", browser, "GET",
+                         f"/search?q={quote(rng.choice(SEARCH_TERMS))}", 200)
+        recorder.request("api_products", browser, "GET", rng.choice(
+            ["/api/v1/products", "/api/v1/products?sort=price_asc", "/api/v1/products?sort=price_desc",
+             "/api/v1/products?category=Relax"]), 200)
+        recorder.request("api_product", browser, "GET",
+                         f"/api/v1/products/{rng.choice(product_ids)}", 200)
+        recorder.request("api_batch", browser, "GET",
+                         f"/api/v1/products?ids={','.join(map(str, rng.sample(product_ids, 10)))}", 200)
+
+        shopper = app.test_client()
+        login(shopper, user_id)
+        for product_id in rng.sample(product_ids, 3):
+            recorder.request("cart_add", shopper, "POST", f"/add_to_cart/{product_id}", 302)
+        recorder.request("cart_view", shopper, "GET", "/cart", 200)
+        recorder.request("api_cart", shopper, "GET", "/api/v1/cart", 200)
+        recorder.request("checkout_delivery", shopper, "POST", "/checkout/delivery", 302,
+                         data={"delivery_method": "kurier", "payment_method": "blik"})
+        recorder.request("checkout_summary", shopper, "GET", "/checkout/summary", 200)
+        recorder.request("place_order", shopper, "POST", "/checkout/summary", 302,
+                         data={"idempotency_key": uuid.uuid4().hex, "blik_code": "123456"})
+        recorder.request("orders", shopper, "GET", "/orders", 200)
+        recorder.request("orders_admin", admin, "GET", "/orders", 200)
+
+    return recorder.summary()
+
+
+def session_cookie(app, **values):
+    serializer = app.session_interface.get_signing_serializer(app)
+    return f"{app.config['SESSION_COOKIE_NAME']}={serializer.dumps(values)}"
+
+
+def shopper_cookie(app, user_id, product_ids):
+    token = uuid.uuid4().hex
+    cart = Cart(token=token, user_id=None)
+    db.session.add(cart)
+    db.session.flush()
+    db.session.execute(CartItem.__table__.insert(), [
+        {"cart_id": cart.id, "product_id": product_id, "quantity": 1}
+        for product_id in product_ids
+    ])
+    db.session.commit()
+    return session_cookie(app, user_id=user_id, role="user", cart_token=token)
+
+
+def run_http_flows(command, env, port, clients, seconds, scenarios):
+    results = {}
+    with serve.running(command, env, port) as base_url:
+        for name, (paths, headers) in scenarios.items():
+            loadgen.run(base_url, paths, clients, min(seconds, 1), headers)  # warm up
+            results[name] = loadgen.run(base_url, paths, clients, seconds, headers)
+    return results
+
+
+def table_sizes():
+    return {
+        model.__tablename__: db.session.scalar(select(func.count()).select_from(model))
+        for model in (Product, User, Order, OrderItem)
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=serve.ROOT,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@contextmanager
+def database(path, products, orders):
+    if path:
+        yield os.path.abspath(path), False
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        yield os.path.join(tmp, "load.db"), (products, orders)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database", help="existing seeded SQLite file (seeds a temporary one if omitted)")
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--server", choices=("gunicorn", "dev", "none"), default="gunicorn")
+    parser.add_argument("--port", type=int, default=5056)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    report = {
+        "commit": git_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "parameters": {k: v for k, v in vars(args).items() if k not in ("output", "port")},
+    }
+
+    with database(args.database, args.products, args.orders) as (path, to_seed):
+        uri = f"sqlite:///{path}"
+        app = create_app({"SQLALCHEMY_DATABASE_URI": uri, "WTF_CSRF_ENABLED": False})
+        with app.app_context():
+            if to_seed:
+                db.create_all()
+                search.ensure_index()
+                started = time.perf_counter()
+                seed.seed(products=to_seed[0], orders=to_seed[1], random_seed=args.seed)
+                report["seed_s"] = round(time.perf_counter() - started, 1)
+            report["tables"] = table_sizes()
+
+            product_ids = db.session.scalars(
+                select(Product.id).order_by(func.random()).limit(1000)).all()
+            user_ids = db.session.scalars(
+                select(User.id).order_by(func.random()).limit(args.iterations + 1)
+            ).all()
+            if len(user_ids) <= args.iterations:
+                parser.error("not enough users; seed more or lower --iterations")
+
+            cookie = shopper_cookie(app, user_ids[0], product_ids[:5])
+            engine = db.engine
+
+        # Outside the app context above: every test-client request must get
+        # its own context (and `g`), as it would in a real server.
+        report["test_client"] = run_client_flows(app, engine, args.iterations, rng,
+                                                 product_ids, user_ids)
+        engine.dispose()
+
+        if args.server != "none":
+            scenarios = {
+                "index": (["/", "/?sort=price_asc", "/?category=Relax"], None),
+                "product_detail": ([f"/product/{i}" for i in product_ids[:200]], None),
+                "api_products": (["/api/v1/products", "/api/v1/products?sort=price_asc",
+                                  "/api/v1/products?category=Relax"], None),
+                "api_product": ([f"/api/v1/products/{i}" for i in product_ids[:200]], None),
+                "search": ([f"/search?q={quote(term)}" for term in SEARCH_TERMS], None),
+                "cart_view": (["/cart"], {"Cookie": cookie}),
+                "api_cart": (["/api/v1/cart"], {"Cookie": cookie}),
+                "orders": (["/orders"], {"Cookie": cookie}),
+            }
+            env = dict(os.environ, DATABASE_URL=uri, FLASK_DEBUG="0", PORT=str(args.port),
+                       BIND=f"127.0.0.1:{args.port}", GUNICORN_ACCESSLOG="",
+                       SECRET_KEY=app.config["SECRET_KEY"])
+            command = serve.gunicorn_command() if args.server == "gunicorn" else [sys.executable, "run.py"]
+            report["http"] = {
+                "server": args.server,
+                **run_http_flows(command, env, args.port, args.clients, args.seconds, scenarios),
+            }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Small threaded HTTP load generator.
+
+Each client thread keeps one keep-alive connection open and requests the
+given paths round-robin until the deadline. Used by the serving and load
+benchmarks; can also be pointed at any running instance:
+
+    python -m benchmarks.loadgen http://127.0.0.1:5000 / /search?q=mate [--clients 8] [--seconds 5]
+"""
+import argparse
+import http.client
+import itertools
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def percentile(values, fraction):
+    # `values` must be sorted.
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, round(fraction * len(values)) - 1))
+    return values[index]
+
+
+def _client(host, port, paths, deadline, latencies, errors, headers):
+    connection = http.client.HTTPConnection(host, port, timeout=30)
+    for path in itertools.cycle(paths):
+        if time.perf_counter() >= deadline:
+            break
+        started = time.perf_counter()
+        try:
+            connection.request("GET", path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 500:
+                errors.append(response.status)
+        except (OSError, http.client.HTTPException) as exc:
+            errors.append(repr(exc))
+            connection.close()
+            connection = http.client.HTTPConnection(host, port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - started)
+    connection.close()
+
+
+def run(base_url, paths, clients=8, seconds=5.0, headers=None):
+    url = urlsplit(base_url)
+    latencies, errors = [], []
+    deadline = time.perf_counter() + seconds
+    threads = [
+        threading.Thread(
+            target=_client,
+            args=(url.hostname, url.port or 80, paths, deadline, latencies, errors, headers or {}),
+        )
+        for _ in range(clients)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def wait_until_ready(base_url, timeout=20.0):
+    url = urlsplit(base_url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=2)
+            connection.request("GET", "/")
+            connection.getresponse().read()
+            connection.close()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("base_url")
+    parser.add_argument("paths", nargs="*", default=["/"])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+    print(json.dumps(run(args.base_url, args.paths, args.clients, args.seconds), indent=2))
+
+
+if __name__ == "__main__":
+    main()
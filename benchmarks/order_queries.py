@@ -0,0 +1,80 @@
+"""Check that the orders pages issue a constant number of SQL queries.
+
+Seeds a throwaway database with a small and a large order history and
+counts the statements behind one page of `main.orders` and one
+`main.order_detail`. Exits non-zero if the count grows with the data;
+tests/test_order_queries.py runs the same check under pytest.
+
+    python -m benchmarks.order_queries
+"""
+import sys
+
+from sqlalchemy import event, insert
+
+from app import db
+from app.models import Order, OrderItem, Product, User
+
+from .common import temporary_app
+
+
+def seed(orders, items_per_order):
+    db.session.execute(insert(Product), [
+        {"name": f"Produkt {i}", "price": 10 + i, "category": "Relax"}
+        for i in range(1, items_per_order + 1)
+    ])
+    db.session.execute(insert(User), [
+        {"username": f"user{i}", "password_hash": "x", "role": "user",
+         "first_name": "Jan", "last_name": f"Nowak{i}"}
+        for i in range(orders)
+    ])
+    user_ids = [row.id for row in db.session.query(User.id).filter(User.role == "user")]
+    db.session.execute(insert(Order), [
+        {"user_id": user_ids[i], "total": 100, "status": "nowe"}
+        for i in range(orders)
+    ])
+    order_ids = [row.id for row in db.session.query(Order.id)]
+    db.session.execute(insert(OrderItem), [
+        {"order_id": order_id, "product_id": product_id, "quantity": 1, "price": 10}
+        for order_id in order_ids
+        for product_id in range(1, items_per_order + 1)
+    ])
+    db.session.commit()
+    return order_ids[-1]
+
+
+def count_queries(orders, items_per_order):
+    with temporary_app(ORDERS_PAGE_SIZE=50) as app:
+        counts = {}
+        with app.app_context():
+            last_order = seed(orders, items_per_order)
+            statements = []
+            event.listen(db.engine, "before_cursor_execute",
+                         lambda *args: statements.append(args[2]))
+
+            client = app.test_client()
+            with client.session_transaction() as session:
+                session["user_id"] = 1
+                session["role"] = "admin"
+
+            for name, url in (("orders", "/orders"), ("order_detail", f"/order/{last_order}")):
+                statements.clear()
+                response = client.get(url)
+                assert response.status_code == 200, (url, response.status_code)
+                counts[name] = len(statements)
+        return counts
+
+
+def main():
+    small = count_queries(orders=5, items_per_order=2)
+    large = count_queries(orders=500, items_per_order=40)
+    print(f"{'page':<14}{'small':>8}{'large':>8}")
+    for name in small:
+        print(f"{name:<14}{small[name]:>8}{large[name]:>8}")
+    if small != large:
+        print("query count depends on data size", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""Sustained order writes against SQLite from concurrent threads.
+
+Each thread prices a cart and calls orders.create_order() in a loop with
+a fresh idempotency key; a second phase fires the same key from every
+thread at once and checks that exactly one order comes out of it.
+
+    python -m benchmarks.order_writes [--threads 8] [--seconds 5] [--lines 5]
+"""
+import argparse
+import threading
+import time
+import uuid
+
+from sqlalchemy import func, insert
+
+from app import db, orders, pricing
+from app.models import Order, Product
+
+from .common import temporary_app
+
+
+def writer(app, cart, deadline, counters, lock, key=None, barrier=None):
+    with app.test_request_context():
+        quote = pricing.quote(cart)
+        if barrier is not None:
+            barrier.wait()
+        while True:
+            try:
+                _, created = orders.create_order(
+                    quote, idempotency_key=key or uuid.uuid4().hex, status="nowe"
+                )
+            except Exception as exc:
+                db.session.rollback()
+                with lock:
+                    counters["errors"] += 1
+                    counters["last_error"] = repr(exc)
+            else:
+                with lock:
+                    counters["created" if created else "deduplicated"] += 1
+            if key is not None or time.perf_counter() >= deadline:
+                break
+        db.session.remove()
+
+
+def run(app, threads, seconds, cart, key=None):
+    counters = {"created": 0, "deduplicated": 0, "errors": 0, "last_error": None}
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads) if key else None
+    deadline = time.perf_counter() + seconds
+    workers = [
+        threading.Thread(target=writer, args=(app, cart, deadline, counters, lock, key, barrier))
+        for _ in range(threads)
+    ]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    counters["elapsed"] = time.perf_counter() - started
+    return counters
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--lines", type=int, default=5)
+    args = parser.parse_args()
+
+    with temporary_app() as app:
+        with app.app_context():
+            db.session.execute(insert(Product), [
+                {"name": f"Yerba {i}", "price": 19.99, "category": "Relax"}
+                for i in range(args.lines)
+            ])
+            db.session.commit()
+            cart = {i: 2 for i in range(1, args.lines + 1)}
+
+        result = run(app, args.threads, args.seconds, cart)
+        rate = result["created"] / result["elapsed"]
+        print(f"threads: {args.threads}  lines/order: {args.lines}")
+        print(f"orders created: {result['created']} in {result['elapsed']:.2f} s "
+              f"-> {rate:.0f} orders/s, errors: {result['errors']}")
+        if result["last_error"]:
+            print(f"last error: {result['last_error']}")
+
+        key = uuid.uuid4().hex
+        duplicate = run(app, args.threads, 0, cart, key=key)
+        with app.app_context():
+            stored = db.session.scalar(
+                db.select(func.count()).select_from(Order).where(Order.idempotency_key == key)
+            )
+        print(f"same key from {args.threads} threads: created={duplicate['created']} "
+              f"deduplicated={duplicate['deduplicated']} errors={duplicate['errors']} stored={stored}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Bytes on the wire per page view, and what a repeat visit costs.
+
+Seeds a throwaway catalog, runs `flask assets build` on the real static
+folder (its output, static/dist/, is not versioned), then for each page:
+
+* the size of the HTML or JSON body without compression, with gzip and
+  with Brotli, and the time the response took with each;
+* a first visit: the page plus every /static/ file it references, as a
+  browser asking for `gzip, deflate, br` would download them;
+* a repeat visit: the page revalidated with its ETag (304 when nothing
+  changed) and only the static files that are not cached as immutable.
+
+    python -m benchmarks.page_weight [--products 200] [--iterations 50]
+"""
+import argparse
+import json
+import re
+import statistics
+import time
+
+from app import db
+from app.assets import assets, build
+
+from . import seed
+from .common import temporary_app
+
+PAGES = ["/", "/?category=Relax", "/product/1", "/search?q=yerba", "/api/v1/products", "/api/v1/products/1"]
+ENCODINGS = {"identity": "identity", "gzip": "gzip", "br": "br"}
+BROWSER = "gzip, deflate, br"
+STATIC = re.compile(r'(?:href|src)="(/static/[^"]+)"')
+
+
+def fetch(client, url, encoding, iterations):
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        response = client.get(url, headers={"Accept-Encoding": encoding})
+        size = len(response.data)
+        timings.append(time.perf_counter() - started)
+    return size, statistics.median(timings) * 1000
+
+
+def cached_forever(response):
+    return response.cache_control.immutable and (response.cache_control.max_age or 0) > 0
+
+
+def visit(client, url):
+    page = client.get(url, headers={"Accept-Encoding": BROWSER})
+    identity = client.get(url).get_data(as_text=True)
+    first = len(page.data)
+    repeat_requests, repeat = 1, 0
+    for asset in dict.fromkeys(STATIC.findall(identity)):
+        response = client.get(asset, headers={"Accept-Encoding": BROWSER})
+        first += len(response.data)
+        if not cached_forever(response):
+            repeat_requests += 1
+            repeat += len(response.data)
+        response.close()
+
+    etag = page.headers.get("ETag")
+    again = client.get(url, headers={"Accept-Encoding": BROWSER, "If-None-Match": etag or ""})
+    repeat += len(again.data)
+    return {
+        "first_visit_bytes": first,
+        "first_visit_requests": 1 + len(set(STATIC.findall(identity))),
+        "repeat_status": again.status_code,
+        "repeat_visit_bytes": repeat,
+        "repeat_visit_requests": repeat_requests,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    with temporary_app() as app:
+        with app.app_context():
+            seed.seed(products=args.products, orders=0)
+            db.session.commit()
+        build(app.static_folder)
+        assets.load(app.static_folder)
+        client = app.test_client()
+
+        results = {}
+        for url in PAGES:
+            result = {}
+            for name, header in ENCODINGS.items():
+                size, ms = fetch(client, url, header, args.iterations)
+                result[f"{name}_bytes"] = size
+                result[f"{name}_ms"] = round(ms, 3)
+            result.update(visit(client, url))
+            results[url] = result
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Logins per second per core for each password hashing setting.
+
+For every method: the time of one hash, raw verifications per second and
+full POST /login requests per second through the test client, all on one
+thread (one core). Each run also checks that logging in a user whose hash
+uses another method rewrites it with the configured one.
+
+With --burst, catalog latency is measured while --threads threads log in
+continuously, with hashing offloaded to a one-thread pool and inline.
+
+    python -m benchmarks.passwords [--methods scrypt:32768:8:1 bcrypt:12] [--seconds 2] [--burst]
+"""
+import argparse
+import statistics
+import threading
+import time
+
+from app import db, passwords
+from app.models import Product, User
+
+from . import loadgen
+from .common import temporary_app
+
+METHODS = (
+    "pbkdf2:sha256:600000",
+    "pbkdf2:sha256:1000000",
+    "scrypt:16384:8:1",
+    "scrypt:32768:8:1",
+    "bcrypt:10",
+    "bcrypt:12",
+)
+PASSWORD = "correct horse battery staple"
+LEGACY_METHOD = "pbkdf2:sha256:1000"
+
+
+def add_user(username, method):
+    user = User(username=username, role="user", password_hash=passwords._hash(PASSWORD, method))
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+def login(client, username):
+    response = client.post("/login", data={"username": username, "password": PASSWORD})
+    if response.status_code != 302:
+        raise RuntimeError(f"login failed: {response.status_code}")
+
+
+def repeat(function, seconds):
+    count = 0
+    started = time.perf_counter()
+    deadline = started + seconds
+    while time.perf_counter() < deadline:
+        function()
+        count += 1
+    return count / (time.perf_counter() - started)
+
+
+def measure(method, seconds):
+    with temporary_app(PASSWORD_HASH_METHOD=method) as app:
+        with app.app_context():
+            current = db.session.get(User, add_user("shopper", method)).password_hash
+            legacy_id = add_user("legacy", LEGACY_METHOD)
+            stored = db.session.get(User, legacy_id).password_hash
+
+            started = time.perf_counter()
+            passwords._hash(PASSWORD, method)
+            hash_ms = (time.perf_counter() - started) * 1000
+            verifies = repeat(lambda: passwords._verify(current, PASSWORD), seconds)
+
+        client = app.test_client()
+        logins = repeat(lambda: login(client, "shopper"), seconds)
+
+        login(app.test_client(), "legacy")
+        with app.app_context():
+            upgraded = passwords.hash_method(db.session.get(User, legacy_id).password_hash)
+    return {
+        "method": method,
+        "hash_ms": round(hash_ms, 1),
+        "verify_per_s": round(verifies, 1),
+        "logins_per_s": round(logins, 1),
+        "rehash": f"{passwords.hash_method(stored)} -> {upgraded}",
+        "rehash_ok": upgraded == passwords.hash_method(passwords._hash("", method)),
+    }
+
+
+def burst(method, workers, threads, seconds):
+    with temporary_app(PASSWORD_HASH_METHOD=method, PASSWORD_HASH_WORKERS=workers) as app:
+        with app.app_context():
+            add_user("shopper", method)
+            db.session.add_all(Product(name=f"Yerba {i}", price=10 + i, category="Relax") for i in range(50))
+            db.session.commit()
+
+        stop = threading.Event()
+
+        def log_in():
+            client = app.test_client()
+            while not stop.is_set():
+                login(client, "shopper")
+
+        loggers = [threading.Thread(target=log_in) for _ in range(threads)]
+        for thread in loggers:
+            thread.start()
+        client = app.test_client()
+        latencies = []
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            client.get("/product/1")
+            latencies.append(time.perf_counter() - started)
+        stop.set()
+        for thread in loggers:
+            thread.join()
+    return {
+        "hash_workers": workers,
+        "catalog_p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "catalog_p95_ms": round(loadgen.percentile(sorted(latencies), 0.95) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--methods", nargs="+", default=METHODS)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--burst", action="store_true")
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'method':<24}{'hash ms':>9}{'verify/s':>10}{'logins/s':>10}  rehash")
+    for method in args.methods:
+        result = measure(method, args.seconds)
+        print(f"{result['method']:<24}{result['hash_ms']:>9}{result['verify_per_s']:>10}"
+              f"{result['logins_per_s']:>10}  {result['rehash']}{'' if result['rehash_ok'] else '  FAILED'}")
+
+    if args.burst:
+        method = args.methods[-1]
+        print(f"\ncatalog latency while {args.threads} threads log in ({method}):")
+        for workers in (0, 1):
+            result = burst(method, workers, args.threads, args.seconds)
+            label = "inline" if workers == 0 else f"pool of {workers}"
+            print(f"  {label:<10} p50 {result['catalog_p50_ms']} ms  p95 {result['catalog_p95_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Time pricing a large cart with a warm price table.
+
+    python -m benchmarks.pricing [--lines 200] [--iterations 2000]
+"""
+import argparse
+import time
+
+from sqlalchemy import insert
+
+from app import db, pricing
+from app.models import Product
+
+from .common import temporary_app
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=200)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    with temporary_app() as app, app.test_request_context():
+        db.session.execute(insert(Product), [
+            {"name": f"Yerba {i}", "price": 9.99 + i / 100, "category": "Relax"}
+            for i in range(args.lines)
+        ])
+        db.session.commit()
+        cart = {product_id: 1 + product_id % 3 for (product_id,) in db.session.query(Product.id)}
+
+        started = time.perf_counter()
+        pricing.quote(cart, "kurier")
+        cold = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for _ in range(args.iterations):
+            quote = pricing.quote(cart, "kurier")
+        warm = (time.perf_counter() - started) / args.iterations
+
+    print(f"lines: {len(quote.lines)}  total: {pricing.format_grosze(quote.total)} zł")
+    print(f"cold quote: {cold * 1000:.3f} ms")
+    print(f"warm quote: {warm * 1000:.3f} ms ({args.iterations} iterations)")
+
+
+if __name__ == "__main__":
+    main()
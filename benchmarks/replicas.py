@@ -0,0 +1,219 @@
+"""Read/write routing between the primary database and a read replica.
+
+Seeds a primary, copies it to a replica with `sync_replica` and then:
+
+* routing: counts the statements each flow sends to either database;
+  writes must all land on the primary and the read-only pages must read
+  from the replica;
+* read-after-write: a shopper checks out and opens the order page and
+  the order list while the replica is still behind (no sync), which only
+  works if the write pinned them to the primary;
+* load: reader threads page through the order list, sales report and
+  search while writer threads create orders, once on the primary alone
+  and once with a replica synced every --sync-interval seconds.
+  Reports read latency percentiles and orders per second.
+
+    python -m benchmarks.replicas [--products 2000] [--orders 50000] [--readers 4] [--writers 2] [--seconds 5]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+from sqlalchemy import event, func, select
+
+from app import db, orders, pricing
+from app.database import REPLICA, sync_replica
+from app.models import Order
+
+from . import loadgen, seed
+from .common import temporary_app
+
+READS = ["/orders", "/orders?status=nowe", "/sales?days=30", "/search?q=yerba+mate", "/"]
+
+
+@contextmanager
+def seeded_app(products, order_count, replica):
+    with tempfile.TemporaryDirectory() as tmp:
+        binds = {REPLICA: "sqlite:///" + os.path.join(tmp, "replica.db")} if replica else {}
+        with temporary_app(SQLALCHEMY_BINDS=binds, METRICS_ENABLED=False) as app:
+            with app.app_context():
+                seed.seed(products=products, orders=order_count)
+                db.session.commit()
+                if replica:
+                    sync_replica(db)
+            yield app
+
+
+def statements(app):
+    counts = Counter()
+    with app.app_context():
+        for key, engine in db.engines.items():
+            name = "primary" if key is None else key
+            event.listen(engine, "before_cursor_execute",
+                         lambda *args, name=name: counts.update([(name, args[2].split()[0].upper())]))
+    return counts
+
+
+def admin_client(app):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session.update(user_id=1, username="bench1", role="admin")
+    return client
+
+
+def routing(app):
+    counts = statements(app)
+    client = admin_client(app)
+    result = {}
+    for path in READS:
+        counts.clear()
+        client.get(path)
+        result[path] = dict(counts)
+
+    shopper = app.test_client()
+    with shopper.session_transaction() as session:
+        session.update(user_id=2, username="bench2", role="user",
+                       checkout_address={"first_name": "Jan", "last_name": "Kowalski", "email": "jan@example.com"},
+                       checkout_delivery="kurier", checkout_payment="odbior")
+    counts.clear()
+    shopper.post("/add_to_cart/1")
+    response = shopper.post("/checkout/summary", data={"idempotency_key": uuid.uuid4().hex})
+    result["checkout"] = dict(counts)
+
+    # The replica has not been synced since the order was placed.
+    location = response.headers.get("Location", "")
+    order_id = int(location.rsplit("/", 1)[1]) if "/order/" in location else None
+    detail = shopper.get(location) if order_id else None
+    listing = shopper.get("/orders")
+    with app.app_context():
+        on_primary = db.session.scalar(select(func.count()).select_from(Order).where(Order.id == order_id))
+        replica_count = None
+        if REPLICA in db.engines:
+            with db.engines[REPLICA].connect() as conn:
+                replica_count = conn.scalar(select(func.count()).select_from(Order).where(Order.id == order_id))
+    result["read_after_write"] = {
+        "order_id": order_id,
+        "on_primary": on_primary,
+        "on_replica": replica_count,
+        "order_page": detail.status_code if detail else None,
+        "in_order_list": bool(order_id) and f"/order/{order_id}\"" in listing.get_data(as_text=True),
+    }
+    return result
+
+
+def load(app, readers, writers, seconds, sync_interval):
+    deadline = time.perf_counter() + seconds
+    latencies, errors, written = [], [], []
+    stop = threading.Event()
+
+    def read_loop(index):
+        client = admin_client(app)
+        n = index
+        while time.perf_counter() < deadline:
+            path = READS[n % len(READS)]
+            n += 1
+            started = time.perf_counter()
+            response = client.get(path)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors.append(f"{path} {response.status_code}")
+
+    def write_loop():
+        with app.test_request_context():
+            quote = pricing.quote({1: 1, 2: 2})
+            while time.perf_counter() < deadline:
+                try:
+                    orders.create_order(quote, idempotency_key=uuid.uuid4().hex, status="nowe")
+                    written.append(1)
+                except Exception as exc:
+                    db.session.rollback()
+                    errors.append(repr(exc))
+            db.session.remove()
+
+    def sync_loop():
+        while not stop.wait(sync_interval):
+            with app.app_context():
+                sync_replica(db)
+
+    threads = [threading.Thread(target=read_loop, args=(i,)) for i in range(readers)]
+    threads += [threading.Thread(target=write_loop) for _ in range(writers)]
+    syncer = None
+    with app.app_context():
+        if REPLICA in db.engines:
+            syncer = threading.Thread(target=sync_loop)
+            syncer.start()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stop.set()
+    if syncer is not None:
+        syncer.join()
+
+    latencies.sort()
+    return {
+        "reads": len(latencies),
+        "read_p50_ms": loadgen.percentile(latencies, 0.5) * 1000,
+        "read_p99_ms": loadgen.percentile(latencies, 0.99) * 1000,
+        "orders_per_second": len(written) / seconds,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--orders", type=int, default=50000)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--sync-interval", type=float, default=1.0)
+    args = parser.parse_args()
+
+    failed = False
+    with seeded_app(args.products, args.orders, replica=True) as app:
+        result = routing(app)
+        print("statements per request (database, kind):")
+        for flow, counts in result.items():
+            if flow != "read_after_write":
+                print(f"  {flow:<22} {dict(sorted(counts.items()))}")
+        reads_ok = all(counts.get(("replica", "SELECT")) and not counts.get(("primary", "SELECT"))
+                       for path, counts in result.items() if path.startswith("/orders") or path.startswith("/sales"))
+        writes_ok = not any(name == "replica" for name, _ in result["checkout"])
+        raw = result["read_after_write"]
+        raw_ok = raw["order_page"] == 200 and raw["in_order_list"] and raw["on_replica"] == 0
+        failed |= not (reads_ok and writes_ok and raw_ok)
+        with app.app_context():
+            started = time.perf_counter()
+            pages = sync_replica(db)
+            elapsed = time.perf_counter() - started
+        print(f"  reads on replica: {'ok' if reads_ok else 'FAILED'}, writes on primary: {'ok' if writes_ok else 'FAILED'}")
+        print(f"read-after-write: order #{raw['order_id']} not yet on the replica ({raw['on_replica']} rows), "
+              f"order page {raw['order_page']}, in the order list: {raw['in_order_list']}"
+              f"{'' if raw_ok else '  FAILED'}")
+        print(f"sync_replica: {pages} pages in {elapsed * 1000:.0f} ms")
+
+    print(f"load, {args.readers} readers + {args.writers} writers, {args.seconds:g} s:")
+    for replica in (False, True):
+        with seeded_app(args.products, args.orders, replica) as app:
+            result = load(app, args.readers, args.writers, args.seconds, args.sync_interval)
+        failed |= bool(result["errors"])
+        label = f"replica, sync every {args.sync_interval:g} s" if replica else "primary only"
+        print(f"  {label:<26} reads {result['reads']:>5}  p50 {result['read_p50_ms']:6.1f} ms  "
+              f"p99 {result['read_p99_ms']:7.1f} ms  {result['orders_per_second']:6.0f} orders/s  "
+              f"errors {len(result['errors'])}")
+        for error in result["errors"][:3]:
+            print(f"      {error}")
+
+    if failed:
+        sys.exit("replica check failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""Synthetic data generator for benchmarks.
+
+Fills the product, user, order and order_item tables with deterministic
+pseudo-random rows using multi-row inserts in batches, then rebuilds the
+search index. Every seeded user has the password BENCH_PASSWORD.
+
+    python -m benchmarks.seed data/bench.db [--products 100000] [--orders 1000000]
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+from app import create_app, db, search
+from app.models import Order, OrderItem, Product, User
+from app.orders import ORDER_STATUSES
+
+BENCH_PASSWORD = "bench"
+
+CATEGORIES = (
+    "Yerba klasyczna",
+    "Energia i pobudzenie",
+    "Wspomaganie odchudzania",
+    "Odporność",
+    "Relax",
+    "Yerba owocowa",
+    "Yerba z herbatą",
+)
+ORIGINS = ("Argentyna", "Brazylia", "Paragwaj", "Urugwaj")
+ADDITIONS = ("mięta", "pomarańcza", "guarana", "żeń-szeń", "malina", "trawa cytrynowa",
+             "imbir", "zielona herbata", "limonka", "hibiskus")
+CITIES = ("Warszawa", "Kraków", "Łódź", "Wrocław", "Poznań", "Gdańsk", "Lublin")
+DELIVERY = ("kurier", "paczkomat", "odbior")
+PAYMENT = ("blik", "przelew", "odbior")
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _insert(table, rows, batch_size):
+    count = 0
+    for batch in _batches(rows, batch_size):
+        db.session.execute(table.insert(), batch)
+        count += len(batch)
+    db.session.commit()
+    return count
+
+
+def _products(rng, count):
+    for i in range(1, count + 1):
+        origin = rng.choice(ORIGINS)
+        addition = rng.choice(ADDITIONS)
+        yield {
+            "name": f"Yerba Mate {origin} {addition.capitalize()} {i}",
+            "price": round(rng.uniform(9, 149), 2),
+            "category": rng.choice(CATEGORIES),
+            "description": f"Susz z plantacji ({origin}) z dodatkiem: {addition}.",
+            "properties": f"yerba mate, {addition}",
+            "preparation": "Zalać wodą o temperaturze 70-80°C.",
+        }
+
+
+def _users(rng, count, password_hash):
+    for i in range(1, count + 1):
+        yield {
+            "username": f"bench{i}",
+            "password_hash": password_hash,
+            "role": "user",
+            "first_name": "Jan",
+            "last_name": f"Testowy{i}",
+            "street": "Leśna",
+            "house_number": str(rng.randint(1, 200)),
+            "postal_code": f"{rng.randint(0, 99):02d}-{rng.randint(0, 999):03d}",
+            "city": rng.choice(CITIES),
+            "email": f"bench{i}@example.com",
+        }
+
+
+def _orders(rng, count, user_ids, first_id, started):
+    # created_at grows with the id, as it does for real orders.
+    step = timedelta(days=365) / max(count, 1)
+    for i in range(count):
+        guest = rng.random() < 0.2
+        yield {
+            "id": first_id + i,
+            "user_id": None if guest else rng.choice(user_ids),
+            "total": 0,
+            "status": rng.choice(ORDER_STATUSES),
+            "created_at": started + step * i,
+            "first_name": "Jan",
+            "last_name": "Testowy",
+            "city": rng.choice(CITIES),
+            "email": "guest@example.com" if guest else None,
+            "delivery_method": rng.choice(DELIVERY),
+            "payment_method": rng.choice(PAYMENT),
+        }
+
+
+def _items(rng, order_ids, product_ids, prices, max_items):
+    for order_id in order_ids:
+        for product_id in rng.sample(product_ids, rng.randint(1, min(max_items, len(product_ids)))):
+            yield {
+                "order_id": order_id,
+                "product_id": product_id,
+                "quantity": rng.randint(1, 4),
+                "price": prices[product_id],
+            }
+
+
+def seed(products=1000, users=None, orders=10000, max_items=5, batch_size=10000, random_seed=1):
+    """Append synthetic rows to the current app's database; returns counts."""
+    from werkzeug.security import generate_password_hash
+
+    rng = random.Random(random_seed)
+    users = max(1, orders // 10) if users is None else users
+    counts = {}
+
+    start_product = (db.session.scalar(db.select(db.func.max(Product.id))) or 0) + 1
+    counts["products"] = _insert(Product.__table__, _products(rng, products), batch_size)
+    rows = db.session.execute(
+        db.select(Product.id, Product.price).where(Product.id >= start_product)
+    )
+    prices = dict(rows.all())
+    product_ids = list(prices)
+
+    password_hash = generate_password_hash(BENCH_PASSWORD)
+    start_user = (db.session.scalar(db.select(db.func.max(User.id))) or 0) + 1
+    counts["users"] = _insert(User.__table__, _users(rng, users, password_hash), batch_size)
+    user_ids = db.session.scalars(db.select(User.id).where(User.id >= start_user)).all()
+
+    # Orders and their items go in together, one batch at a time, so a
+    # million orders never have to sit in memory at once.
+    first_order = (db.session.scalar(db.select(db.func.max(Order.id))) or 0) + 1
+    started = datetime.now() - timedelta(days=365)
+    counts["orders"] = counts["order_items"] = 0
+    for batch in _batches(_orders(rng, orders, user_ids, first_order, started), batch_size):
+        items = list(_items(rng, [row["id"] for row in batch], product_ids, prices, max_items))
+        totals = {}
+        for item in items:
+            totals[item["order_id"]] = totals.get(item["order_id"], 0) + item["price"] * item["quantity"]
+        for row in batch:
+            row["total"] = round(totals[row["id"]], 2)
+        db.session.execute(Order.__table__.insert(), batch)
+        db.session.execute(OrderItem.__table__.insert(), items)
+        db.session.commit()
+        counts["orders"] += len(batch)
+        counts["order_items"] += len(items)
+
+    search.rebuild()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("database", help="SQLite file to create or extend")
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=None)
+    parser.add_argument("--orders", type=int, default=1000000)
+    parser.add_argument("--max-items", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.abspath(args.database)}"})
+    with app.app_context():
+        db.create_all()
+        search.ensure_index()
+        started = time.perf_counter()
+        counts = seed(args.products, args.users, args.orders, args.max_items,
+                      args.batch_size, args.seed)
+        elapsed = time.perf_counter() - started
+    print(", ".join(f"{name}: {count}" for name, count in counts.items()) + f" in {elapsed:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
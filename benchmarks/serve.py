@@ -0,0 +1,85 @@
+"""Compare the development server with gunicorn on the same catalog.
+
+Starts `python run.py` (Werkzeug, debug off) and then gunicorn with
+gunicorn.conf.py against a copy of data/mini_shop.db, drives both with
+benchmarks.loadgen and prints requests/second and latency percentiles.
+
+    python -m benchmarks.serve [--clients 16] [--seconds 5] [--workers 2] [--threads 4]
+"""
+import argparse
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+from . import loadgen
+
+ROOT = Path(__file__).resolve().parent.parent
+PATHS = ["/", "/?sort=price_asc", "/product/1", "/search?q=yerba"]
+
+
+@contextmanager
+def running(command, env, port):
+    """Start a server subprocess and yield its base URL once it answers."""
+    base_url = f"http://127.0.0.1:{port}"
+    process = subprocess.Popen(
+        command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        if not loadgen.wait_until_ready(base_url):
+            raise RuntimeError(f"{command[0]} did not start on port {port}")
+        yield base_url
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=30)
+
+
+def gunicorn_command():
+    return [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "run:app"]
+
+
+def serve(command, env, port, clients, seconds):
+    with running(command, env, port) as base_url:
+        loadgen.run(base_url, PATHS, clients, 1)  # warm caches
+        return loadgen.run(base_url, PATHS, clients, seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--port", type=int, default=5055)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = Path(tmp) / "shop.db"
+        shutil.copy(ROOT / "data" / "mini_shop.db", database)
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite:///{database}",
+            FLASK_DEBUG="0",
+            PORT=str(args.port),
+            BIND=f"127.0.0.1:{args.port}",
+            WEB_CONCURRENCY=str(args.workers),
+            GUNICORN_THREADS=str(args.threads),
+            GUNICORN_ACCESSLOG="",
+        )
+        servers = {
+            "dev server": [sys.executable, "run.py"],
+            f"gunicorn {args.workers}x{args.threads}": gunicorn_command(),
+        }
+        for name, command in servers.items():
+            result = serve(command, env, args.port, args.clients, args.seconds)
+            print(f"{name:<14} {result['rps']:>8.1f} req/s  p50={result['p50_ms']:.1f}ms "
+                  f"p95={result['p95_ms']:.1f}ms p99={result['p99_ms']:.1f}ms "
+                  f"errors={result['errors']}")
+
+
+if __name__ == "__main__":
+    main()
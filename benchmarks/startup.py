@@ -0,0 +1,85 @@
+"""Cold-start cost of the application.
+
+Times `import app`, `create_app()` and the first request in fresh
+interpreters (median of --runs), and checks that modules only needed by
+forms and image uploads are not imported at startup. Exits non-zero if
+one of them is or if create_app() queried the database.
+
+    python -m benchmarks.startup [--runs 7]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+LAZY_MODULES = ("wtforms", "flask_wtf", "email_validator", "PIL")
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+queries = []
+event.listen(Engine, "before_cursor_execute", lambda *a: queries.append(a[2]))
+application = app.create_app()
+created = time.perf_counter()
+startup_queries = len(queries)
+startup_modules = set(sys.modules)
+application.test_client().get("/")
+first_request = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "create_app_ms": (created - imported) * 1000,
+    "first_request_ms": (first_request - created) * 1000,
+    "startup_queries": startup_queries,
+    "loaded": sorted(m for m in %r if m in startup_modules),
+}))
+"""
+
+
+def probe(env):
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE % (LAZY_MODULES,)],
+        cwd=ROOT, env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = Path(tmp) / "shop.db"
+        shutil.copy(ROOT / "data" / "mini_shop.db", database)
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{database}", PYTHONPATH=str(ROOT))
+        runs = [probe(env) for _ in range(args.runs)]
+
+    result = {
+        key: round(statistics.median(run[key] for run in runs), 1)
+        for key in ("import_ms", "create_app_ms", "first_request_ms")
+    }
+    result["startup_queries"] = runs[0]["startup_queries"]
+    result["eagerly_loaded"] = runs[0]["loaded"]
+    print(json.dumps(result, indent=2))
+
+    if result["eagerly_loaded"]:
+        print(f"imported at startup: {', '.join(result['eagerly_loaded'])}", file=sys.stderr)
+        return 1
+    if result["startup_queries"]:
+        print(f"create_app() ran {result['startup_queries']} queries", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,37 @@
+import multiprocessing
+import os
+
+# gunicorn -c gunicorn.conf.py run:app
+#
+# Every setting can be overridden from the environment. Reload workers
+# gracefully with `kill -HUP <master pid>`; to pick up new code (the app is
+# preloaded in the master) start a new master with `kill -USR2` and stop
+# the old one with `kill -TERM` once the new workers are serving.
+
+bind = os.environ.get("BIND", "0.0.0.0:5000")
+
+# Catalog pages are mostly CPU (templates), so scale processes with cores;
+# SQLite still takes one writer at a time, hence the cap. Threads cover
+# requests waiting on the database or slow clients.
+workers = int(os.environ.get("WEB_CONCURRENCY", min(multiprocessing.cpu_count() * 2, 8)))
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+# The preloaded app reads this to share its catalog cache generation
+# between the workers (app/catalog.py).
+os.environ["WEB_CONCURRENCY"] = str(workers)
+worker_class = "gthread"
+
+# Build the app once in the master; workers fork with it already imported
+# (database pools are reset in each child, see app/database.py).
+preload_app = True
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+
+# Recycle workers now and then so slow leaks cannot accumulate.
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 5000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 500))
+
+accesslog = os.environ.get("GUNICORN_ACCESSLOG", "-") or None
+errorlog = "-"
+loglevel = os.environ.get("GUNICORN_LOGLEVEL", "info")
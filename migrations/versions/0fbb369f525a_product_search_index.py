@@ -0,0 +1,29 @@
+"""product search index
+
+Revision ID: 0fbb369f525a
+Revises: 70db6e6a07a7
+Create Date: 2026-10-18 11:05:28.818920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0fbb369f525a'
+down_revision = '70db6e6a07a7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Populated by `flask search rebuild`; kept in sync by the product routes.
+    op.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS product_search USING fts5("
+        "name, description, properties, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS product_search")
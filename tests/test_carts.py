@@ -0,0 +1,41 @@
+from sqlalchemy import func, select
+
+from app import carts as cart_service, db, inventory
+from app.models import Cart, StockReservation, User
+from benchmarks import inventory as flash_sale
+from benchmarks.common import temporary_app
+
+
+def test_increasing_a_product_missing_from_the_cart_reserves_nothing():
+    with temporary_app(**flash_sale.CONFIG) as app:
+        flash_sale.setup(app, stock=5)
+        with app.test_request_context():
+            assert cart_service.add(2)
+            assert not cart_service.change(1, 1)
+            assert inventory.levels([1]) == {1: 5}
+            assert db.session.scalar(
+                select(func.count()).select_from(StockReservation).where(StockReservation.product_id == 1)
+            ) == 0
+
+
+def test_a_user_has_one_cart_across_devices():
+    with temporary_app(PASSWORD_HASH_METHOD="pbkdf2:sha256:1000", **flash_sale.CONFIG) as app:
+        flash_sale.setup(app, stock=5)
+        with app.app_context():
+            user = User(username="kasia", role="user")
+            user.set_password("sekret")
+            db.session.add(user)
+            db.session.commit()
+
+        phone, laptop = app.test_client(), app.test_client()
+        for client in (phone, laptop):
+            client.post("/login", data={"username": "kasia", "password": "sekret"})
+        assert phone.post("/add_to_cart/1").status_code == 302
+        assert laptop.post("/add_to_cart/2").status_code == 302
+        assert laptop.post("/add_to_cart/1").status_code == 302
+
+        with app.app_context():
+            assert db.session.scalar(select(func.count()).select_from(Cart)) == 1
+        for client in (phone, laptop):
+            items = client.get("/api/v1/cart").get_json()["items"]
+            assert {item["product_id"]: item["quantity"] for item in items} == {1: 2, 2: 1}
@@ -0,0 +1,90 @@
+import base64
+import json
+
+import pytest
+from sqlalchemy import insert
+
+from app import db
+from app.cache import MISSING, SqliteBackend
+from app.catalog import catalog_cache
+from app.models import Product
+from app.pagination import decode_cursor, encode_cursor
+from benchmarks.common import temporary_app
+
+
+def tampered(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+@pytest.fixture(scope="module")
+def client():
+    with temporary_app(METRICS_ENABLED=False) as app:
+        with app.app_context():
+            db.session.execute(insert(Product), [
+                {"name": f"Yerba {n}", "price": 10.0 + n, "category": "Relax"} for n in range(30)
+            ])
+            db.session.commit()
+        yield app.test_client()
+
+
+def test_decode_cursor_accepts_only_values_of_the_column_types():
+    columns = [Product.price, Product.id]
+    assert decode_cursor(encode_cursor([12.5, 3]), columns) == [12.5, 3]
+    assert decode_cursor(encode_cursor([12, 3]), columns) == [12, 3]
+    for values in ([{}, 3], [[1], 3], [12.5, "3"], [12.5, True], [None, 3], [12.5], "x"):
+        assert decode_cursor(tampered(values), columns) is None
+    assert decode_cursor("not base64!", columns) is None
+
+
+@pytest.mark.parametrize("path", ["/", "/api/v1/products"])
+@pytest.mark.parametrize("sort, cursor", [
+    ("newest", [{}]),
+    ("newest", [[1]]),
+    ("price_asc", [[1], 2]),
+    ("price_desc", ["a", {}]),
+])
+def test_tampered_cursor_shows_the_first_page(client, path, sort, cursor):
+    first = client.get(path, query_string={"sort": sort})
+    response = client.get(path, query_string={"sort": sort, "after": tampered(cursor)})
+    assert response.status_code == 200
+    assert response.data == first.data
+    response = client.get(path, query_string={"sort": sort, "before": tampered(cursor)})
+    assert response.status_code == 200
+
+
+def test_next_cursor_continues_the_listing(client):
+    first = client.get("/api/v1/products", query_string={"sort": "price_asc"}).get_json()
+    second = client.get("/api/v1/products", query_string={"sort": "price_asc", "after": first["next"]}).get_json()
+    assert first["next"] and second["items"]
+    assert second["items"][0]["price"] > first["items"][-1]["price"]
+
+
+def test_shared_cache_drops_expired_and_oldest_entries(tmp_path):
+    backend = SqliteBackend(str(tmp_path / "cache.db"), maxsize=100)
+    for n in range(50):
+        backend.set(f"expired:{n}", n, ttl=-1)
+    for n in range(SqliteBackend.PRUNE_EVERY * 2 - 50):
+        backend.set(f"key:{n}", n)
+    assert len(backend) == 100
+    assert backend.get("expired:0") is MISSING
+    assert backend.get("key:49") is MISSING
+    assert backend.get("key:50") == 50
+
+
+def test_page_cache_keys_are_normalized(tmp_path):
+    with temporary_app(METRICS_ENABLED=False, CATALOG_CACHE_SHARED_PATH=str(tmp_path / "cache.db")) as app:
+        with app.app_context():
+            db.session.execute(insert(Product), [
+                {"name": f"Yerba {n}", "price": 10.0, "category": "Relax"} for n in range(5)
+            ])
+            db.session.commit()
+        shared = catalog_cache.shared
+        client = app.test_client()
+        for query in ({}, {"after": "garbage"}, {"after": tampered([{}])}, {"per_page": "24"},
+                      {"sort": "nope"}, {"category": "Nie ma takiej"}, {"category": "x" * 500}):
+            assert client.get("/api/v1/products", query_string=query).status_code == 200
+        assert len(shared) == 1
+
+        with app.test_request_context():
+            catalog_cache.invalidate_listings()
+        assert len(shared) == 0
@@ -0,0 +1,16 @@
+from app.config import Config
+from benchmarks.concurrency import ROLLBACK_JOURNAL, read_during_write
+
+
+def test_wal_reads_proceed_while_a_write_transaction_is_open():
+    rows, elapsed, error = read_during_write(Config.SQLITE_PRAGMAS, busy_timeout_ms=100)
+    assert error is None
+    # The reader sees the last committed data, not the open transaction's.
+    assert rows == 100
+    assert elapsed < 0.05
+
+
+def test_rollback_journal_locks_readers_out_during_a_write():
+    rows, elapsed, error = read_during_write(ROLLBACK_JOURNAL, busy_timeout_ms=100)
+    assert rows is None
+    assert "database is locked" in error
@@ -0,0 +1,18 @@
+from benchmarks import inventory as flash_sale
+
+
+def test_concurrent_checkouts_never_oversell():
+    result = flash_sale.direct(stock=60, threads=4)
+    assert result["errors"] == []
+    assert result["sold"] == result["orders"] == 60
+    assert result["left"] == 0
+
+
+def test_abandoned_carts_hold_stock_until_they_expire():
+    result = flash_sale.carts(stock=40, shoppers=8)
+    assert result["unexpected"] == []
+    assert result["sold"] == result["orders"]
+    assert result["sold"] + result["held"] == 40
+    assert result["left"] == 0
+    assert result["released"] == result["held"] == result["left_after_expiry"]
+
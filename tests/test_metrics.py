@@ -0,0 +1,15 @@
+import pytest
+
+from benchmarks.common import temporary_app
+
+
+@pytest.mark.parametrize("config, headers, status", [
+    ({}, {}, 404),
+    ({"DEBUG": True}, {}, 200),
+    ({"METRICS_TOKEN": "sekret"}, {}, 401),
+    ({"METRICS_TOKEN": "sekret"}, {"Authorization": "Bearer zle"}, 401),
+    ({"METRICS_TOKEN": "sekret"}, {"Authorization": "Bearer sekret"}, 200),
+])
+def test_metrics_need_a_token_outside_debug_mode(config, headers, status):
+    with temporary_app(**config) as app:
+        assert app.test_client().get("/metrics", headers=headers).status_code == status
@@ -0,0 +1,7 @@
+from benchmarks.order_queries import count_queries
+
+
+def test_orders_pages_issue_constant_number_of_queries():
+    small = count_queries(orders=5, items_per_order=2)
+    large = count_queries(orders=200, items_per_order=20)
+    assert small == large
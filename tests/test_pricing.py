@@ -0,0 +1,51 @@
+import uuid
+
+import pytest
+from sqlalchemy import func, insert, select, update
+
+from app import db, orders, pricing
+from app.catalog import catalog_cache
+from app.models import Order, Product
+from benchmarks.common import temporary_app
+
+
+def test_order_is_refused_when_the_cached_price_is_stale():
+    with temporary_app(METRICS_ENABLED=False) as app:
+        with app.app_context():
+            db.session.execute(insert(Product), [{"name": "Yerba", "price": 20.0, "category": "Relax"}])
+            db.session.commit()
+        with app.test_request_context():
+            quote = pricing.quote({1: 2})
+            # Another worker edits the price; this process's cache has not seen it.
+            db.session.execute(update(Product).where(Product.id == 1).values(price=25.0))
+            db.session.commit()
+
+            with pytest.raises(pricing.PriceChanged):
+                orders.create_order(quote, idempotency_key=uuid.uuid4().hex)
+            assert db.session.scalar(select(func.count()).select_from(Order)) == 0
+
+            fresh = pricing.quote({1: 2})
+            assert fresh.items_total == 5000
+            order, created = orders.create_order(fresh, idempotency_key=uuid.uuid4().hex)
+            assert created and order.total == 50.0
+
+
+def test_price_table_is_bounded_and_follows_the_catalog_generation():
+    with temporary_app(METRICS_ENABLED=False) as app:
+        with app.app_context():
+            db.session.execute(insert(Product), [
+                {"name": f"Yerba {n}", "price": 10.0 + n, "category": "Relax"} for n in range(10)
+            ])
+            db.session.commit()
+        table = pricing.PriceTable(maxsize=4)
+        with app.test_request_context():
+            prices = table.lookup(range(1, 11))
+            assert {pid: unit_price for pid, (unit_price, _) in prices.items()} == {
+                n + 1: 1000 + 100 * n for n in range(10)
+            }
+            assert len(table._current[1]) == 4
+
+            db.session.execute(update(Product).where(Product.id == 1).values(price=30.0))
+            db.session.commit()
+            catalog_cache.invalidate_product(1)
+            assert table.lookup([1])[1][0] == 3000
@@ -0,0 +1,38 @@
+import io
+import json
+
+from sqlalchemy import select
+
+from app import db
+from app.models import Product
+from app.product_import import import_products
+from benchmarks.common import temporary_app
+
+
+def test_image_urls_without_images_flag_must_be_loadable(tmp_path):
+    (tmp_path / "stored.jpg").write_bytes(b"jpeg")
+    urls = {
+        "remote": "https://cdn.example.com/yerba.png",
+        "stored": "/static/images/stored.jpg",
+        "relative": "x.png",
+        "local": "/home/admin/yerba.png",
+        "missing": "/static/images/missing.jpg",
+        "traversal": "/static/images/../../config.py",
+        "script": "javascript:alert(1)",
+    }
+    rows = "".join(
+        json.dumps({"sku": sku, "name": f"Yerba {sku}", "price": 10, "category": "Relax", "image_url": url}) + "\n"
+        for sku, url in urls.items()
+    )
+    with temporary_app(METRICS_ENABLED=False, IMAGE_DIR=str(tmp_path)) as app:
+        with app.app_context():
+            result = import_products(io.StringIO(rows), "jsonl")
+            stored = dict(db.session.execute(select(Product.sku, Product.image_url)).all())
+
+    assert result.inserted == len(urls) and result.rejected == 0
+    assert stored == {
+        "remote": urls["remote"], "stored": urls["stored"], "relative": None, "local": None,
+        "missing": None, "traversal": None, "script": None,
+    }
+    assert [line for line, _ in result.errors] == [3, 4, 5, 6, 7]
+    assert all(message.startswith("image_url: ") for _, message in result.errors)